@@ -1,8 +1,8 @@
 from os import path as ospath, mkdir, system, getenv
 from logging import INFO, ERROR, FileHandler, StreamHandler, basicConfig, getLogger
 from traceback import format_exc
-from asyncio import Queue, Lock
 
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pyrogram import Client
 from pyrogram.enums import ParseMode
@@ -21,16 +21,10 @@ LOGS = getLogger(__name__)
 load_dotenv('config.env')
 
 ani_cache = {
-    'fetch_animes': True,
-    'ongoing': set(),
-    'completed': set()
+    'fetch_animes': True
 }
 ffpids_cache = list()
 
-ffLock = Lock()
-ffQueue = Queue()
-ff_queued = dict()
-
 class Var:
     API_ID, API_HASH, BOT_TOKEN = getenv("API_ID"), getenv("API_HASH"), getenv("BOT_TOKEN")
     MONGO_URI = getenv("MONGO_URI")
@@ -40,6 +34,8 @@ class Var:
         exit(1)
 
     RSS_ITEMS = getenv("RSS_ITEMS", "https://subsplease.org/rss/?r=1080").split()
+    RSS_INTERVAL = int(getenv("RSS_INTERVAL", "60"))
+    JOB_RETENTION = int(getenv("JOB_RETENTION", "30"))
     FSUB_CHATS = list(map(int, getenv('FSUB_CHATS').split()))
     BACKUP_CHANNEL = getenv("BACKUP_CHANNEL") or ""
     MAIN_CHANNEL = int(getenv("MAIN_CHANNEL"))
@@ -50,11 +46,54 @@ class Var:
     SEND_SCHEDULE = getenv("SEND_SCHEDULE", "False").lower() == "true"
     BRAND_UNAME = getenv("BRAND_UNAME", "@username")
     
-    # Updated FFmpeg commands - encode video only, copy audio and subtitles
-    FFCODE_1080 = getenv("FFCODE_1080") or """ffmpeg -i '{}' -progress '{}' -preset veryfast -c:v libx264 -s 1920x1080 -pix_fmt yuv420p -crf 30 -c:a copy -c:s copy -map 0 -level 3.1 '{}' -y"""
-    FFCODE_720 = getenv("FFCODE_720") or """ffmpeg -i '{}' -progress '{}' -preset superfast -c:v libx264 -s 1280x720 -pix_fmt yuv420p -crf 30 -c:a copy -c:s copy -map 0 -level 3.1 '{}' -y"""
+    # Encoder profile - encode video only, copy audio and subtitles ( FFCODE_<qual> overrides with a raw command )
+    FF_CODEC = getenv("FF_CODEC", "libx264")
+    FF_PRESET = getenv("FF_PRESET", "")
+    FF_CRF = int(getenv("FF_CRF", "30"))
+    FF_TUNE = getenv("FF_TUNE", "")
+    FF_PARAMS = getenv("FF_PARAMS", "")
+    FF_CALIBRATE = getenv("FF_CALIBRATE", "False").lower() == "true"
+    FF_TARGET_SPEED = float(getenv("FF_TARGET_SPEED", "1.5"))
+    FF_CALIBRATE_SECONDS = int(getenv("FF_CALIBRATE_SECONDS", "5"))
     
     QUALS = getenv("QUALS", "720 1080").split()
+    FF_PARALLEL = getenv("FF_PARALLEL", "False").lower() == "true"
+    FF_THREADS = int(getenv("FF_THREADS", "0"))
+    TOR_STREAM = getenv("TOR_STREAM", "False").lower() == "true"
+    TOR_STREAM_BUFFER = int(getenv("TOR_STREAM_BUFFER", "32"))
+    TOR_STREAM_STALL = int(getenv("TOR_STREAM_STALL", "300"))
+    FF_REMUX = getenv("FF_REMUX", "False").lower() == "true"
+    FF_REMUX_KBPS = int(getenv("FF_REMUX_KBPS", "0"))
+    FF_SEGMENTS = int(getenv("FF_SEGMENTS", "0"))
+    UPLOAD_BUFFER = int(getenv("UPLOAD_BUFFER", "1"))
+    UP_SESSIONS = int(getenv("UP_SESSIONS", "4"))
+    UP_WORKERS = int(getenv("UP_WORKERS", "4"))
+    UP_PART_KB = int(getenv("UP_PART_KB", "512"))
+    ENCODE_WORKERS = int(getenv("ENCODE_WORKERS", "1"))
+    QUEUE_AGING = int(getenv("QUEUE_AGING", "1800"))
+    RESTART_TIMEOUT = int(getenv("RESTART_TIMEOUT", "7200"))
+    HOT_ANIMES = list(map(int, getenv("HOT_ANIMES", "").split()))
+    
+    ANILIST_TTL = int(getenv("ANILIST_TTL", "259200"))
+    ANILIST_NEG_TTL = int(getenv("ANILIST_NEG_TTL", "3600"))
+    FILE_CACHE_TTL = int(getenv("FILE_CACHE_TTL", "86400"))
+    FILE_CACHE_SIZE = int(getenv("FILE_CACHE_SIZE", "2048"))
+    FSUB_TTL = int(getenv("FSUB_TTL", "120"))
+    BATCH_LIMIT = int(getenv("BATCH_LIMIT", "50"))
+    
+    TG_GLOBAL_RATE = int(getenv("TG_GLOBAL_RATE", "25"))
+    TG_CHAT_RATE = int(getenv("TG_CHAT_RATE", "1"))
+    TG_CHAT_BURST = int(getenv("TG_CHAT_BURST", "3"))
+    TG_GROUP_RATE = int(getenv("TG_GROUP_RATE", "20"))
+    PROGRESS_MIN_INTERVAL = int(getenv("PROGRESS_MIN_INTERVAL", "5"))
+    PROGRESS_MAX_INTERVAL = int(getenv("PROGRESS_MAX_INTERVAL", "30"))
+    PROGRESS_THRESHOLD = float(getenv("PROGRESS_THRESHOLD", "1"))
+    IO_WORKERS = int(getenv("IO_WORKERS", "0"))
+    CPU_WORKERS = int(getenv("CPU_WORKERS", "0"))
+    CPU_POOL_PROCESS = getenv("CPU_POOL_PROCESS", "False").lower() == "true"
+    HTTP_LIMIT = int(getenv("HTTP_LIMIT", "100"))
+    HTTP_LIMIT_PER_HOST = int(getenv("HTTP_LIMIT_PER_HOST", "10"))
+    HTTP_TIMEOUT = int(getenv("HTTP_TIMEOUT", "60"))
     
     AS_DOC = getenv("AS_DOC", "True").lower() == "true"
     THUMB = getenv("THUMB", "https://te.legra.ph/file/621c8d40f9788a1db7753.jpg")
@@ -70,6 +109,46 @@ class Var:
     ]
     SEND_CELEBRATION_STICKER = getenv("SEND_CELEBRATION_STICKER", "True").lower() == "true"
 
+class HTTPClient:
+    def __init__(self):
+        self.__sess = None
+
+    @property
+    def session(self):
+        if self.__sess is None or self.__sess.closed:
+            self.__sess = ClientSession(
+                connector=TCPConnector(limit=Var.HTTP_LIMIT, limit_per_host=Var.HTTP_LIMIT_PER_HOST,
+                                       ttl_dns_cache=300, keepalive_timeout=60),
+                timeout=ClientTimeout(total=Var.HTTP_TIMEOUT, sock_connect=15)
+            )
+        return self.__sess
+
+    async def start(self):
+        return self.session
+
+    async def close(self):
+        if self.__sess is not None and not self.__sess.closed:
+            await self.__sess.close()
+        self.__sess = None
+
+http_client = HTTPClient()
+
+class BotInfo:
+    def __init__(self):
+        self.id = None
+        self.username = None
+        self.name = None
+
+    async def load(self, client):
+        me = await client.get_me()
+        self.id, self.username, self.name = me.id, me.username, me.first_name
+        return self
+
+    def link(self, payload):
+        return f"https://telegram.me/{self.username}?start={payload}"
+
+bot_info = BotInfo()
+
 if Var.THUMB and not ospath.exists("thumb.jpg"):
     system(f"wget -q {Var.THUMB} -O thumb.jpg")
     LOGS.info("Thumbnail has been Saved!!")
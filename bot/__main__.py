@@ -6,9 +6,14 @@ from os import path as ospath, execl, kill
 from sys import executable
 from signal import SIGKILL
 
-from bot import bot, Var, bot_loop, sch, LOGS, ffQueue, ffLock, ffpids_cache, ff_queued
-from bot.core.auto_animes import fetch_animes
+from bot import bot, Var, bot_loop, bot_info, sch, LOGS, ffpids_cache, http_client
+from bot.core.auto_animes import fetch_animes, resume_jobs
+from bot.core.database import db
+from bot.core.autodel import autodel
+from bot.core.executors import executors
+from bot.core.ffprofile import calibrate_profiles
 from bot.core.func_utils import clean_up, new_task, editMessage
+from bot.core.cache_utils import get_chat
 from bot.modules.up_posts import upcoming_animes
 
 @bot.on_message(command('restart') & user(Var.ADMINS))
@@ -26,6 +31,8 @@ async def restart(client, message):
             except (OSError, ProcessLookupError):
                 LOGS.error("Killing Process Failed !!")
                 continue
+    await http_client.close()
+    executors.shutdown()
     await (await create_subprocess_exec('python3', 'update.py')).wait()
     async with aiopen(".restartmsg", "w") as f:
         await f.write(f"{rmessage.chat.id}\n{rmessage.id}\n")
@@ -40,29 +47,26 @@ async def restart():
         except Exception as e:
             LOGS.error(e)
             
-async def queue_loop():
-    LOGS.info("Queue Loop Started !!")
-    while True:
-        if not ffQueue.empty():
-            post_id = await ffQueue.get()
-            await asleep(1.5)
-            ff_queued[post_id].set()
-            await asleep(1.5)
-            async with ffLock:
-                ffQueue.task_done()
-        await asleep(10)
-
 async def main():
     sch.add_job(upcoming_animes, "cron", hour=0, minute=30)
     await bot.start()
+    await bot_info.load(bot)
+    await gather(*(get_chat(chat_id) for chat_id in {Var.MAIN_CHANNEL, *Var.FSUB_CHATS}), return_exceptions=True)
+    await http_client.start()
+    await db.setup()
+    autodel.start()
     await restart()
     LOGS.info('Auto Anime Bot Started!')
     sch.start()
-    bot_loop.create_task(queue_loop())
+    if Var.FF_CALIBRATE:
+        await calibrate_profiles()
+    await resume_jobs()
     await fetch_animes()
     await idle()
     LOGS.info('Auto Anime Bot Stopped!')
     await bot.stop()
+    await http_client.close()
+    executors.shutdown()
     for task in all_tasks:
         task.cancel()
     await clean_up()
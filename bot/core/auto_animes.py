@@ -1,4 +1,4 @@
-from asyncio import gather, create_task, sleep as asleep, Event
+from asyncio import gather, create_task, sleep as asleep, Queue, Semaphore
 from asyncio.subprocess import PIPE
 from os import path as ospath, system
 from aiofiles import open as aiopen
@@ -9,13 +9,18 @@ from time import time
 from random import choice
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from bot import bot, bot_loop, Var, ani_cache, ffQueue, ffLock, ff_queued
+from bot import bot, bot_loop, bot_info, Var, ani_cache
 from .tordownload import TorDownloader
 from .database import db
-from .func_utils import getfeed, encode, editMessage, sendMessage, convertBytes
+from .ffqueue import ffQueue
+from .rssfetcher import rss
+from .journal import journal
+from .func_utils import handle_logs, encode, editMessage, sendMessage, convertBytes
 from .text_utils import TextEditor
-from .ffencoder import FFEncoder
+from .ffencoder import FFEncoder, FFParallel
 from .tguploader import TgUploader
+from .ratelimit import tglimiter
+from .progress import updater
 from .reporter import rep
 
 btn_formatter = {
@@ -23,14 +28,31 @@ btn_formatter = {
     '720':'𝟳𝟮𝟬𝗽'
 }
 
+def make_buttons(uploaded):
+    btns = []
+    for qual in Var.QUALS:
+        if qual not in uploaded:
+            continue
+        msg, link = uploaded[qual]
+        btn = InlineKeyboardButton(f"{btn_formatter.get(qual, qual+'p')} - {convertBytes(msg.document.file_size)}", url=link)
+        if len(btns) != 0 and len(btns[-1]) == 1:
+            btns[-1].append(btn)
+        else:
+            btns.append([btn])
+    return btns
+
 async def fetch_animes():
     await rep.report("Fetch Animes Started !!", "info")
     while True:
-        await asleep(60)
+        await asleep(5)
         if ani_cache['fetch_animes']:
-            for link in Var.RSS_ITEMS:
-                if (info := await getfeed(link, 0)):
-                    bot_loop.create_task(get_animes(info.title, info.link))
+            for link in rss.due_feeds():
+                bot_loop.create_task(fetch_feed(link))
+
+@handle_logs
+async def fetch_feed(link):
+    for info in await rss.new_entries(link):
+        bot_loop.create_task(get_animes(info.title, info.link, seen=(rss.entry_key(info), link)))
 
 async def send_celebration_sticker(channel_id):
     """Send a random celebration sticker to the channel"""
@@ -39,114 +61,246 @@ async def send_celebration_sticker(channel_id):
     
     try:
         sticker_id = choice(Var.CELEBRATION_STICKERS)
-        await bot.send_sticker(chat_id=channel_id, sticker=sticker_id)
+        await tglimiter.call(channel_id, bot.send_sticker, chat_id=channel_id, sticker=sticker_id)
         await rep.report("🎉 Celebration sticker sent!", "info")
     except Exception as e:
         await rep.report(f"Failed to send celebration sticker: {str(e)}", "warning")
 
-async def get_animes(name, torrent, force=False):
+async def resume_jobs():
+    for job in await journal.pending():
+        stage = min((task['state'] for task in job['tasks'].values() if task['state'] not in journal.FINAL), key=journal.STATES.index)
+        await rep.report(f"Resuming Interrupted Task from {stage.title()}...\n\n{job['name']}", "info")
+        bot_loop.create_task(get_animes(job['name'], job['torrent'], job.get('force', False), job))
+
+async def get_animes(name, torrent, force=False, job=None, seen=None):
+    claimed = False
     try:
         aniInfo = TextEditor(name)
         await aniInfo.load_anilist()
         ani_id, ep_no = aniInfo.adata.get('id'), aniInfo.pdata.get("episode_number")
-        if ani_id not in ani_cache['ongoing']:
-            ani_cache['ongoing'].add(ani_id)
-        elif not force:
+        job_key = journal.key(ani_id, ep_no, name)
+        if not (claimed := journal.claim(job_key)) and not force:
+            await rss.mark_seen(seen)
             return
-        if not force and ani_id in ani_cache['completed']:
+        if not (force or job) and await journal.is_done(job_key):
+            await rss.mark_seen(seen)
             return
-        if force or (not (ani_data := await db.getAnime(ani_id)) \
-            or (ani_data and not (qual_data := ani_data.get(ep_no))) \
-            or (ani_data and qual_data and not all(qual for qual in qual_data.values()))):
+        if force or job or not await db.isEpisodeDone(ani_id, ep_no, Var.QUALS):
             
             if "[Batch]" in name:
                 await rep.report(f"Torrent Skipped!\n\n{name}", "warning")
+                await rss.mark_seen(seen)
                 return
             
+            if job is None:
+                await journal.start(job_key, name, torrent, force)
+            await rss.mark_seen(seen)
+            renditions = (job or {}).get('tasks') or {}
+            
             # Check if it's a magnet link or torrent file
             source_type = "Magnet Link" if torrent.startswith("magnet:") else "Torrent File"
-            await rep.report(f"New Anime {source_type} Found!\n\n{name}", "info")
             
-            post_msg = await bot.send_photo(
-                Var.MAIN_CHANNEL,
-                photo=await aniInfo.get_poster(),
-                caption=await aniInfo.get_caption()
-            )
-            #post_msg = await sendMessage(Var.MAIN_CHANNEL, (await aniInfo.get_caption()).format(await aniInfo.get_poster()), invert_media=True)
+            post_msg = None
+            if job and job.get('post_id'):
+                post_msg = await bot.get_messages(Var.MAIN_CHANNEL, job['post_id'])
+                if not post_msg or post_msg.empty:
+                    post_msg = None
+            if not post_msg:
+                await rep.report(f"New Anime {source_type} Found!\n\n{name}", "info")
+                post_msg = await tglimiter.call(Var.MAIN_CHANNEL, bot.send_photo,
+                    Var.MAIN_CHANNEL,
+                    photo=await aniInfo.get_poster(),
+                    caption=await aniInfo.get_caption()
+                )
+                #post_msg = await sendMessage(Var.MAIN_CHANNEL, (await aniInfo.get_caption()).format(await aniInfo.get_poster()), invert_media=True)
+            if job and (stale := [job[key] for key in ('stat_id', 'up_id') if job.get(key)]):
+                try:
+                    await tglimiter.call(Var.MAIN_CHANNEL, bot.delete_messages, Var.MAIN_CHANNEL, stale)
+                except Exception:
+                    pass
             
             await asleep(1.5)
             stat_msg = await sendMessage(Var.MAIN_CHANNEL, f"‣ <b>Anime Name :</b> <b><i>{name}</i></b>\n\n<i>Downloading from {source_type}...</i>")
-            dl = await TorDownloader("./downloads").download(torrent, name)
-            if not dl or not ospath.exists(dl):
-                await rep.report(f"File Download Incomplete, Try Again", "error")
-                await stat_msg.delete()
-                return
-
             post_id = post_msg.id
-            ffEvent = Event()
-            ff_queued[post_id] = ffEvent
-            if ffLock.locked():
-                await editMessage(stat_msg, f"‣ <b>Anime Name :</b> <b><i>{name}</i></b>\n\n<i>Queued to Encode...</i>")
-                await rep.report("Added Task to Queue...", "info")
-            await ffQueue.put(post_id)
-            await ffEvent.wait()
+            await journal.update(job_key, post_id=post_id, stat_id=stat_msg.id)
             
-            await ffLock.acquire()
-            btns = []
-            for qual in Var.QUALS:
-                filename = await aniInfo.get_upname(qual)
-                await editMessage(stat_msg, f"‣ <b>Anime Name :</b> <b><i>{name}</i></b>\n\n<i>Ready to Encode...</i>")
-                
-                await asleep(1.5)
-                await rep.report("Starting Encode...", "info")
-                try:
-                    out_path = await FFEncoder(stat_msg, dl, filename, qual).start_encode()
-                except Exception as e:
-                    await rep.report(f"Error: {e}, Cancelled,  Retry Again !", "error")
-                    await stat_msg.delete()
-                    ffLock.release()
-                    return
-                await rep.report("Succesfully Compressed Now Going To Upload...", "info")
-                
-                await editMessage(stat_msg, f"‣ <b>Anime Name :</b> <b><i>{filename}</i></b>\n\n<i>Ready to Upload...</i>")
-                await asleep(1.5)
+            uploaded = {}
+            for qual, rendition in renditions.items():
+                if qual in Var.QUALS and (msg_id := rendition.get('msg_id')):
+                    msg = await bot.get_messages(Var.FILE_STORE, msg_id)
+                    uploaded[qual] = (msg, bot_info.link(await encode('get-'+str(msg_id * abs(Var.FILE_STORE)))))
+            encoded = {qual: rendition['out'] for qual, rendition in renditions.items()
+                       if qual in Var.QUALS and qual not in uploaded and rendition.get('out') and ospath.exists(rendition['out'])}
+            pending = [qual for qual in Var.QUALS if qual not in uploaded and qual not in encoded]
+            
+            tor_stream, dl, slot_held, up_msg = None, (job or {}).get('dl'), False, None
+
+            def release_slot():
+                nonlocal slot_held
+                if slot_held:
+                    slot_held = False
+                    ffQueue.release(post_id)
+
+            try:
+                if pending and not (dl and ospath.exists(dl)):
+                    await journal.set_state(job_key, pending, 'downloading')
+                    if Var.TOR_STREAM and not Var.FF_PARALLEL:
+                        tor_stream = await TorDownloader("./downloads").stream(torrent)
+                    if tor_stream:
+                        dl = tor_stream.path
+                        await rep.report(f"Streaming Torrent into Encoder while Downloading...\n\n{name}", "info")
+                    else:
+                        dl = await TorDownloader("./downloads").download(torrent, name)
+                        if not dl or not ospath.exists(dl):
+                            await rep.report(f"File Download Incomplete, Try Again", "error")
+                            await journal.fail(job_key)
+                            await rss.forget(seen)
+                            await stat_msg.delete()
+                            return
+                        await journal.update(job_key, dl=dl)
+
+                async def queue_status(pos):
+                    await updater.update(stat_msg, f"‣ <b>Anime Name :</b> <b><i>{name}</i></b>\n\n<i>Queued to Encode...</i>\n\n‣ <b>Queue Position :</b> <code>{pos}</code>")
+                threads = 0
+                if pending:
+                    if ffQueue.waiting or len(ffQueue.active) >= ffQueue.workers:
+                        await rep.report("Added Task to Queue...", "info")
+                    priority = 2 if force else 1 if ani_id in Var.HOT_ANIMES else 0
+                    await journal.set_state(job_key, pending, 'queued')
+                    threads = await ffQueue.acquire(post_id, queue_status, priority, name)
+                    slot_held = True
+            
+                upload_queue, buffer = Queue(), Semaphore(max(Var.UPLOAD_BUFFER, 1))
+
+                async def encode_all():
+                    nonlocal dl, tor_stream
+                    try:
+                        if Var.FF_PARALLEL:
+                            names = {qual: await aniInfo.get_upname(qual) for qual in pending}
+                            if names:
+                                await editMessage(stat_msg, f"‣ <b>Anime Name :</b> <b><i>{name}</i></b>\n\n<i>Ready to Encode...</i>")
+                                await rep.report("Starting Parallel Encode...", "info")
+                                await journal.set_state(job_key, list(names), 'encoding')
+                                encoded.update(await FFParallel(stat_msg, dl, names, threads).start_encode())
+                                for qual in names:
+                                    await journal.rendition(job_key, qual, out=encoded[qual])
+                                await rep.report("Succesfully Compressed Now Going To Upload...", "info")
+                            for qual in Var.QUALS:
+                                if qual in encoded:
+                                    upload_queue.put_nowait((qual, encoded[qual]))
+                            return
+                        for qual in Var.QUALS:
+                            if qual in uploaded:
+                                continue
+                            await buffer.acquire()
+                            if qual in encoded:
+                                upload_queue.put_nowait((qual, encoded[qual]))
+                                continue
+                            filename = await aniInfo.get_upname(qual)
+                            await editMessage(stat_msg, f"‣ <b>Anime Name :</b> <b><i>{name}</i></b>\n\n<i>Ready to Encode...</i>")
+                        
+                            await asleep(1.5)
+                            await rep.report("Starting Encode...", "info")
+                            await journal.set_state(job_key, [qual], 'encoding')
+                            if tor_stream:
+                                encoder = FFEncoder(stat_msg, tor_stream.fifo, filename, qual, threads, probe_path=dl)
+                                watcher = create_task(tor_stream.watch(encoder.cancel_encode))
+                                try:
+                                    out_path = await encoder.start_encode()
+                                finally:
+                                    watcher.cancel()
+                                dl, tor_stream = await tor_stream.wait(), None
+                                await journal.update(job_key, dl=dl)
+                            else:
+                                out_path = await FFEncoder(stat_msg, dl, filename, qual, threads).start_encode()
+                            await journal.rendition(job_key, qual, out=out_path)
+                            await rep.report("Succesfully Compressed Now Going To Upload...", "info")
+                            upload_queue.put_nowait((qual, out_path))
+                    finally:
+                        release_slot()
+                        upload_queue.put_nowait(None)
+
+                async def upload_all():
+                    nonlocal up_msg
+                    while (item := await upload_queue.get()) is not None:
+                        qual, out_path = item
+                        if not Var.FF_PARALLEL:
+                            buffer.release()
+                        ready = f"‣ <b>Anime Name :</b> <b><i>{ospath.basename(out_path or '')}</i></b>\n\n<i>Ready to Upload...</i>"
+                        if up_msg:
+                            await editMessage(up_msg, ready)
+                        elif up_msg := await sendMessage(Var.MAIN_CHANNEL, ready):
+                            await journal.update(job_key, up_id=up_msg.id)
+                        await asleep(1.5)
+                        file_id, acked = journal.resumable(renditions.get(qual), out_path)
+                        if file_id:
+                            await journal.set_state(job_key, [qual], 'uploading')
+                        else:
+                            file_id = bot.rnd_id()
+                            await journal.upload(job_key, qual, out_path, file_id)
+                        try:
+                            msg = await TgUploader(up_msg).upload(out_path, qual, file_id, acked, journal.tracker(job_key, qual))
+                        finally:
+                            await journal.flush(job_key, qual)
+                        await rep.report("Succesfully Uploaded File into Tg...", "info")
+                    
+                        msg_id = msg.id
+                        await journal.uploaded(job_key, qual, msg_id)
+                        link = bot_info.link(await encode('get-'+str(msg_id * abs(Var.FILE_STORE))))
+                        uploaded[qual] = (msg, link)
+                    
+                        if post_msg:
+                            await editMessage(post_msg, post_msg.caption.html if post_msg.caption else "", InlineKeyboardMarkup(make_buttons(uploaded)))
+                    
+                        await db.saveAnime(ani_id, ep_no, qual, post_id)
+                        bot_loop.create_task(extra_utils(msg_id, out_path))
+
+                enc_task, up_task = create_task(encode_all()), create_task(upload_all())
                 try:
-                    msg = await TgUploader(stat_msg).upload(out_path, qual)
+                    await gather(enc_task, up_task)
                 except Exception as e:
+                    enc_task.cancel()
+                    up_task.cancel()
+                    await gather(enc_task, up_task, return_exceptions=True)
+                    await journal.fail(job_key)
+                    await rss.forget(seen)
                     await rep.report(f"Error: {e}, Cancelled,  Retry Again !", "error")
                     await stat_msg.delete()
-                    ffLock.release()
+                    if up_msg:
+                        await up_msg.delete()
                     return
-                await rep.report("Succesfully Uploaded File into Tg...", "info")
-                
-                msg_id = msg.id
-                link = f"https://telegram.me/{(await bot.get_me()).username}?start={await encode('get-'+str(msg_id * abs(Var.FILE_STORE)))}"
-                
-                if post_msg:
-                    if len(btns) != 0 and len(btns[-1]) == 1:
-                        btns[-1].insert(1, InlineKeyboardButton(f"{btn_formatter[qual]} - {convertBytes(msg.document.file_size)}", url=link))
-                    else:
-                        btns.append([InlineKeyboardButton(f"{btn_formatter[qual]} - {convertBytes(msg.document.file_size)}", url=link)])
-                    await editMessage(post_msg, post_msg.caption.html if post_msg.caption else "", InlineKeyboardMarkup(btns))
-                    
-                await db.saveAnime(ani_id, ep_no, qual, post_id)
-                bot_loop.create_task(extra_utils(msg_id, out_path))
-            ffLock.release()
+            finally:
+                release_slot()
+                if tor_stream:
+                    await tor_stream.cancel()
             
             # Send celebration sticker after all qualities are processed and uploaded
             await send_celebration_sticker(Var.MAIN_CHANNEL)
             
+            updater.clear(stat_msg)
             await stat_msg.delete()
-            await aioremove(dl)
-        ani_cache['completed'].add(ani_id)
+            if up_msg:
+                updater.clear(up_msg)
+                await up_msg.delete()
+            if dl and ospath.exists(dl):
+                await aioremove(dl)
+            await journal.finish(job_key)
+        else:
+            await rss.mark_seen(seen)
     except Exception as error:
         await rep.report(format_exc(), "error")
+        if claimed:
+            await journal.fail(job_key)
+        await rss.forget(seen)
+    finally:
+        if claimed:
+            journal.release(job_key)
 
 async def extra_utils(msg_id, out_path):
     msg = await bot.get_messages(Var.FILE_STORE, message_ids=msg_id)
 
     if Var.BACKUP_CHANNEL != 0:
         for chat_id in Var.BACKUP_CHANNEL.split():
-            await msg.copy(int(chat_id))
+            await tglimiter.call(int(chat_id), msg.copy, int(chat_id))
             
     # MediaInfo, ScreenShots, Sample Video ( Add-ons Features )
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from asyncio import Event, wait_for, sleep as asleep, TimeoutError as AsyncTimeoutError
+
+from bot import bot, bot_loop, LOGS
+from .database import db
+from .ratelimit import tglimiter
+
+class AutoDeleter:
+    def __init__(self, batch=1000):
+        self.__batch = batch
+        self.__wake = Event()
+        self.__next = None
+        self.__task = None
+        self.deleted = 0
+
+    def start(self):
+        if self.__task is None:
+            self.__task = bot_loop.create_task(self.__run())
+
+    async def schedule(self, chat_id, msg_ids, delay):
+        due = datetime.utcnow() + timedelta(seconds=delay)
+        await db.addDeletions(chat_id, msg_ids, due)
+        if self.__next is None or due < self.__next:
+            self.__next = due
+            self.__wake.set()
+
+    async def __run(self):
+        while True:
+            try:
+                self.__next = await db.nextDeletion()
+                timeout = max((self.__next - datetime.utcnow()).total_seconds(), 0) if self.__next else None
+                try:
+                    await wait_for(self.__wake.wait(), timeout)
+                except AsyncTimeoutError:
+                    pass
+                self.__wake.clear()
+                await self.__purge()
+            except Exception as e:
+                LOGS.error(f"Auto Delete Failed: {e}")
+                await asleep(5)
+
+    async def __purge(self):
+        now = datetime.utcnow()
+        while docs := await db.getDueDeletions(now, self.__batch):
+            chats = {}
+            for doc in docs:
+                chats.setdefault(doc['chat_id'], []).append(doc['msg_id'])
+            for chat_id, msg_ids in chats.items():
+                for i in range(0, len(msg_ids), 100):
+                    try:
+                        await tglimiter.call(chat_id, bot.delete_messages, chat_id, msg_ids[i:i+100])
+                    except Exception as e:
+                        LOGS.warning(f"Auto Delete in {chat_id} Failed: {e}")
+            await db.dropDeletions(doc['_id'] for doc in docs)
+            self.deleted += len(docs)
+            if len(docs) < self.__batch:
+                break
+
+autodel = AutoDeleter()
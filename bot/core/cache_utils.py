@@ -0,0 +1,75 @@
+from time import time
+from functools import wraps
+from collections import OrderedDict
+from asyncio import ensure_future
+
+from bot import bot
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__data = OrderedDict()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return self.__lookup(key) is not None
+
+    def __lookup(self, key):
+        if (item := self.__data.get(key)) is not None and item[1] and item[1] < time():
+            del self.__data[key]
+            return None
+        return item
+
+    def get(self, key, default=None):
+        if (item := self.__lookup(key)) is None:
+            self.misses += 1
+            return default
+        self.__data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key, value=True, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.__data[key] = (value, time() + ttl if ttl else 0)
+        self.__data.move_to_end(key)
+        while len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self.__data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        self.__data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self.__data), 'hits': self.hits, 'misses': self.misses,
+                'ratio': round(self.hits / total * 100, 2) if total else 0.0}
+
+def memoize(ttl=0, maxsize=128):
+    def decorator(func):
+        cache, pending = TTLCache(maxsize=maxsize, ttl=ttl), {}
+
+        @wraps(func)
+        async def wrapper(*args):
+            if (value := cache.get(args)) is not None:
+                return value
+            if (future := pending.get(args)) is None:
+                future = pending[args] = ensure_future(func(*args))
+                future.add_done_callback(lambda _, key=args: pending.pop(key, None))
+            value = await future
+            cache.set(args, value)
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+@memoize(ttl=6 * 3600)
+async def get_chat(chat_id):
+    return await bot.get_chat(chat_id)
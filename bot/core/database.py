@@ -1,4 +1,8 @@
+from time import time
+from asyncio import gather
+from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 from bot import Var
 
 class MongoDB:
@@ -6,19 +10,135 @@ class MongoDB:
         self.__client = AsyncIOMotorClient(uri)
         self.__db = self.__client[database_name]
         self.__animes = self.__db.animes[Var.BOT_TOKEN.split(':')[0]]
+        self.__episodes = self.__db.episodes[Var.BOT_TOKEN.split(':')[0]]
+        self.__seen = self.__db.seen[Var.BOT_TOKEN.split(':')[0]]
+        self.__anilist = self.__db.anilist
+        self.__jobs = self.__db.jobs[Var.BOT_TOKEN.split(':')[0]]
+        self.__tasks = self.__db.tasks[Var.BOT_TOKEN.split(':')[0]]
+        self.__deletions = self.__db.deletions[Var.BOT_TOKEN.split(':')[0]]
+
+    async def setup(self):
+        await self.__episodes.create_index([('ani_id', 1), ('ep', 1)])
+        if not await self.__episodes.estimated_document_count():
+            await self.__migrateEpisodes()
+        await self.__seen.create_index('feed')
+        await self.__anilist.create_index('expires', expireAfterSeconds=0)
+        await self.__jobs.create_index('expires', expireAfterSeconds=0)
+        await self.__tasks.create_index([('job', 1), ('qual', 1)])
+        await self.__tasks.create_index('state')
+        await self.__tasks.create_index('expires', expireAfterSeconds=0)
+        await self.__deletions.create_index('due')
 
     async def getAnime(self, ani_id):
         botset = await self.__animes.find_one({'_id': ani_id})
         return botset or {}
 
+    @staticmethod
+    def __legacyEpisodes(doc):
+        for key, quals in doc.items():
+            if not isinstance(quals, dict):
+                continue
+            ep = key.replace('_', '.')
+            yield ep, [qual for qual, ok in quals.items() if ok is True]
+            for sub, nested in quals.items():
+                if isinstance(nested, dict):
+                    yield f"{ep}.{sub}", [qual for qual, ok in nested.items() if ok is True]
+
+    async def __migrateEpisodes(self):
+        ops = []
+        async for doc in self.__animes.find():
+            for ep, done in self.__legacyEpisodes(doc):
+                if done:
+                    ops.append(UpdateOne({'_id': f"{doc['_id']}:{ep}"}, {'$addToSet': {'quals': {'$each': done}},
+                                         '$setOnInsert': {'ani_id': doc['_id'], 'ep': ep}}, upsert=True))
+        if ops:
+            await self.__episodes.bulk_write(ops, ordered=False)
+
+    async def isEpisodeDone(self, ani_id, ep, quals):
+        return bool(await self.__episodes.find_one({'_id': f"{ani_id}:{ep}", 'quals': {'$all': list(quals)}}, {'_id': 1}))
+
     async def saveAnime(self, ani_id, ep, qual, post_id=None):
-        quals = (await self.getAnime(ani_id)).get(ep, {qual: False for qual in Var.QUALS})
-        quals[qual] = True
-        await self.__animes.update_one({'_id': ani_id}, {'$set': {ep: quals}}, upsert=True)
-        if post_id:
-            await self.__animes.update_one({'_id': ani_id}, {'$set': {"msg_id": post_id}}, upsert=True)
+        await self.saveAnimes([(ani_id, ep, qual, post_id)])
+
+    async def saveAnimes(self, entries):
+        anime_ops, episode_ops = [], []
+        for ani_id, ep, qual, post_id in entries:
+            fields = {f"{str(ep).replace('.', '_')}.{qual}": True}
+            if post_id:
+                fields['msg_id'] = post_id
+            anime_ops.append(UpdateOne({'_id': ani_id}, {'$set': fields}, upsert=True))
+            episode_ops.append(UpdateOne({'_id': f"{ani_id}:{ep}"}, {'$addToSet': {'quals': qual},
+                                         '$set': {'ani_id': ani_id, 'ep': ep, **({'msg_id': post_id} if post_id else {})}}, upsert=True))
+        if entries:
+            await gather(self.__animes.bulk_write(anime_ops, ordered=False), self.__episodes.bulk_write(episode_ops, ordered=False))
+
+    async def getSeen(self, keys):
+        return {doc['_id'] async for doc in self.__seen.find({'_id': {'$in': list(keys)}}, {'_id': 1})}
+
+    async def hasSeenFeed(self, feed):
+        return bool(await self.__seen.find_one({'feed': feed}, {'_id': 1}))
+
+    async def saveSeen(self, keys, feed):
+        if keys:
+            await self.__seen.bulk_write([UpdateOne({'_id': key}, {'$setOnInsert': {'feed': feed, 'ts': time()}}, upsert=True) for key in keys], ordered=False)
+
+    async def dropSeen(self, keys):
+        if keys:
+            await self.__seen.delete_many({'_id': {'$in': list(keys)}})
+
+    async def getAniCache(self, key):
+        if (doc := await self.__anilist.find_one({'_id': key})) and doc['expires'] > datetime.utcnow():
+            return doc['data'], (doc['expires'] - datetime.utcnow()).total_seconds()
+        return None, 0
+
+    async def saveAniCache(self, key, data, ttl):
+        await self.__anilist.update_one({'_id': key}, {'$set': {'data': data, 'expires': datetime.utcnow() + timedelta(seconds=ttl)}}, upsert=True)
+
+    async def getActiveJobs(self, final):
+        keys = await self.__tasks.distinct('job', {'state': {'$nin': list(final)}})
+        tasks = {}
+        async for task in self.__tasks.find({'job': {'$in': keys}}):
+            tasks.setdefault(task['job'], {})[task['qual']] = task
+        return [{**job, 'tasks': tasks.get(job['_id'], {})} async for job in self.__jobs.find({'_id': {'$in': keys}}).sort('ts', 1)]
+
+    async def getJobTasks(self, key):
+        return {task['qual']: task async for task in self.__tasks.find({'job': key})}
+
+    async def saveJob(self, key, fields, unset=()):
+        update = {'$set': fields, '$setOnInsert': {'ts': time()}}
+        if unset:
+            update['$unset'] = {field: "" for field in unset}
+        await self.__jobs.update_one({'_id': key}, update, upsert=True)
+
+    async def addJobTasks(self, key, quals, state):
+        await self.__tasks.bulk_write([UpdateOne({'_id': f"{key}:{qual}"}, {'$setOnInsert': {'job': key, 'qual': qual, 'state': state,
+                                                 'updated': datetime.utcnow()}}, upsert=True) for qual in quals], ordered=False)
+
+    async def saveJobTasks(self, key, quals, fields, unset=(), skip=()):
+        update = {'$set': {**fields, 'updated': datetime.utcnow()}}
+        if unset:
+            update['$unset'] = {field: "" for field in unset}
+        await self.__tasks.update_many({'_id': {'$in': [f"{key}:{qual}" for qual in quals]}, 'state': {'$nin': list(skip)}}, update)
+
+    async def ackJobParts(self, key, qual, parts):
+        await self.__tasks.update_one({'_id': f"{key}:{qual}"}, {'$addToSet': {'upload.parts': {'$each': list(parts)}}})
+
+    async def addDeletions(self, chat_id, msg_ids, due):
+        if msg_ids:
+            await self.__deletions.insert_many([{'chat_id': chat_id, 'msg_id': msg_id, 'due': due} for msg_id in msg_ids], ordered=False)
+
+    async def nextDeletion(self):
+        doc = await self.__deletions.find_one({}, {'due': 1}, sort=[('due', 1)])
+        return doc['due'] if doc else None
+
+    async def getDueDeletions(self, now, limit=1000):
+        return [doc async for doc in self.__deletions.find({'due': {'$lte': now}}).sort('due', 1).limit(limit)]
+
+    async def dropDeletions(self, ids):
+        await self.__deletions.delete_many({'_id': {'$in': list(ids)}})
 
     async def reboot(self):
         await self.__animes.drop()
+        await self.__episodes.drop()
 
 db = MongoDB(Var.MONGO_URI, "FZAutoAnimes")
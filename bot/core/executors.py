@@ -0,0 +1,71 @@
+from functools import partial
+from multiprocessing import cpu_count, get_context
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from bot import Var, LOGS, bot_loop
+
+class PoolExecutor:
+    def __init__(self, name, workers, process=False):
+        self.name = name
+        self.workers = workers
+        self.process = process
+        self.__pool = None
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+
+    @property
+    def pool(self):
+        if self.__pool is None:
+            if self.process:
+                self.__pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('fork'))
+            else:
+                self.__pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-pool")
+        return self.__pool
+
+    def __track(self, func):
+        self.running += 1
+        try:
+            return func()
+        finally:
+            self.running -= 1
+
+    async def run(self, func, *args, **kwargs):
+        pfunc = partial(func, *args, **kwargs)
+        self.pending += 1
+        try:
+            return await bot_loop.run_in_executor(self.pool, pfunc if self.process else partial(self.__track, pfunc))
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self):
+        running = min(self.pending, self.workers) if self.process else self.running
+        return {'type': 'process' if self.process else 'thread', 'workers': self.workers, 'running': running,
+                'queued': max(self.pending - running, 0), 'completed': self.completed,
+                'utilization': round(running / self.workers * 100, 2)}
+
+    def shutdown(self):
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=False, cancel_futures=True)
+            self.__pool = None
+
+class Executors:
+    def __init__(self):
+        self.pools = {
+            'io': PoolExecutor('io', Var.IO_WORKERS or min(32, cpu_count() * 4)),
+            'cpu': PoolExecutor('cpu', Var.CPU_WORKERS or cpu_count(), process=Var.CPU_POOL_PROCESS),
+        }
+
+    def __getitem__(self, name):
+        return self.pools[name]
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def shutdown(self):
+        for name, pool in self.pools.items():
+            LOGS.info(f"Shutting Down {name.upper()} Pool...")
+            pool.shutdown()
+
+executors = Executors()
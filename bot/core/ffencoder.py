@@ -1,104 +1,255 @@
-from re import findall 
-from math import floor
+from math import floor, ceil
 from time import time
 from os import path as ospath
+from uuid import uuid4
+from collections import deque
+from multiprocessing import cpu_count
 from aiofiles import open as aiopen
-from aiofiles.os import remove as aioremove, rename as aiorename
-from shlex import split as ssplit
-from asyncio import sleep as asleep, gather, create_subprocess_shell, create_task
+from aiofiles.os import rename as aiorename, makedirs, listdir
+from aioshutil import rmtree as aiormtree
+from asyncio import sleep as asleep, gather, create_subprocess_exec, create_task, Semaphore
 from asyncio.subprocess import PIPE
 
 from bot import Var, bot_loop, ffpids_cache, LOGS
-from .func_utils import mediainfo, convertBytes, convertTime, sendMessage, editMessage
+from .func_utils import mediainfo, ffprobe, convertBytes, convertTime, sendMessage, editMessage
+from .progress import updater
+from .ffprofile import ffprofiles
 from .reporter import rep
 
-ffargs = {
-    '1080': Var.FFCODE_1080,
-    '720': Var.FFCODE_720,
-}
+class FFProgress:
+    def __init__(self):
+        self.__block = {}
+
+    def feed(self, line):
+        key, _, value = line.strip().partition('=')
+        if not key:
+            return None
+        self.__block[key.strip()] = value.strip()
+        if key != 'progress':
+            return None
+        block, self.__block = self.__block, {}
+        out_time = block.get('out_time_us') or block.get('out_time_ms') or '0'
+        return {
+            'out_time': int(out_time) / 1000000 if out_time.lstrip('-').isdigit() else 0,
+            'total_size': int(size) if (size := block.get('total_size', '0')).isdigit() else 0,
+            'fps': float(fps) if (fps := block.get('fps', '')).replace('.', '', 1).isdigit() else 0.0,
+            'speed': float(speed) if (speed := block.get('speed', '').rstrip('x')).replace('.', '', 1).isdigit() else 0.0,
+            'bitrate': block.get('bitrate', 'N/A'),
+            'end': block['progress'] == 'end',
+        }
 
 class FFEncoder:
-    def __init__(self, message, path, name, qual):
-        self.__proc = None
+    def __init__(self, message, path, name, qual, threads=0, report=True, on_progress=None, probe_path=None):
+        self.__procs = []
         self.is_cancelled = False
         self.message = message
         self.__name = name
         self.__qual = qual
+        self.__threads = threads
+        self.__report = report
+        self.__on_progress = on_progress
         self.dl_path = path
+        self.__probe_path = probe_path or path
+        self.__streamed = probe_path is not None
         self.__total_time = None
         self.out_path = ospath.join("encode", name)
-        self.__prog_file = 'prog.txt'
+        self.__job_id = uuid4().hex[:8]
         self.__start_time = time()
+        self.stats = {'percent': 0.0, 'ensize': 0, 'tsize': 0, 'speed': 0, 'diff': 0, 'eta': 0, 'done': False,
+                      'fps': 0.0, 'enc_speed': 0.0, 'bitrate': 'N/A', 'out_time': 0}
 
-    async def progress(self):
-        self.__total_time = await mediainfo(self.dl_path, get_duration=True)
-        if isinstance(self.__total_time, str):
-            self.__total_time = 1.0
-        while not (self.__proc is None or self.is_cancelled):
-            async with aiopen(self.__prog_file, 'r+') as p:
-                text = await p.read()
-            if text:
-                time_done = floor(int(t[-1]) / 1000000) if (t := findall("out_time_ms=(\d+)", text)) else 1
-                ensize = int(s[-1]) if (s := findall(r"total_size=(\d+)", text)) else 0
-                
-                diff = time() - self.__start_time
-                speed = ensize / diff
-                percent = round((time_done/self.__total_time)*100, 2)
-                tsize = ensize / (max(percent, 0.01)/100)
-                eta = (tsize-ensize)/max(speed, 0.01)
-    
-                bar = floor(percent/8)*"█" + (12 - floor(percent/8))*"▒"
-                
-                progress_str = f"""<blockquote>‣ <b>Anime Name :</b> <b><i>{self.__name}</i></b></blockquote>
+    @property
+    def name(self):
+        return self.__name
+
+    def __update_stats(self, event):
+        ensize = event['total_size']
+        diff = time() - self.__start_time
+        speed = ensize / diff
+        percent = min(round((event['out_time']/self.__total_time)*100, 2), 100)
+        tsize = ensize / (max(percent, 0.01)/100)
+        self.stats.update(percent=percent, ensize=ensize, tsize=tsize, speed=speed, diff=diff,
+                          eta=(tsize-ensize)/max(speed, 0.01), done=event['end'], fps=event['fps'],
+                          enc_speed=event['speed'], bitrate=event['bitrate'], out_time=event['out_time'])
+
+    async def __progress_event(self, event):
+        self.__update_stats(event)
+        if self.__on_progress:
+            await self.__on_progress(self.stats)
+        if self.__report:
+            await updater.update(self.message, self.__render, self.stats['percent'])
+
+    async def __run(self, ffcode, on_event=None):
+        LOGS.info(f'FFCode: {ffcode}')
+        proc = await create_subprocess_exec(*ffcode, stdout=PIPE, stderr=PIPE)
+        self.__procs.append(proc)
+        ffpids_cache.append(proc.pid)
+
+        async def read_progress():
+            parser = FFProgress()
+            while line := await proc.stdout.readline():
+                if on_event and (event := parser.feed(line.decode(errors='ignore'))) is not None:
+                    await on_event(event)
+
+        async def drain_stderr():
+            tail = deque(maxlen=40)
+            while line := await proc.stderr.readline():
+                tail.append(line)
+            return b"".join(tail)
+
+        try:
+            _, stderr, return_code = await gather(read_progress(), drain_stderr(), proc.wait())
+        finally:
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                    await proc.wait()
+                except ProcessLookupError:
+                    pass
+            ffpids_cache.remove(proc.pid)
+            self.__procs.remove(proc)
+        return return_code, stderr
+
+    async def __encode_segments(self, profile, out_npath):
+        work_dir = ospath.join("encode", f"segments_{self.__job_id}")
+        await makedirs(work_dir, exist_ok=True)
+        try:
+            seg_time = ceil(self.__total_time / Var.FF_SEGMENTS)
+            return_code, stderr = await self.__run(['ffmpeg', '-hide_banner', '-i', self.dl_path, '-map', '0:v:0', '-c', 'copy',
+                                                    '-f', 'segment', '-segment_time', str(seg_time), '-reset_timestamps', '1',
+                                                    ospath.join(work_dir, 'in_%03d.mkv'), '-y'])
+            if return_code != 0:
+                return return_code, stderr
+            segments = sorted(f for f in await listdir(work_dir) if f.startswith('in_'))
+            if not segments:
+                LOGS.warning("Segment Split Produced No Segments, Falling Back to Single Encode")
+                return await self.__run(profile.command(self.dl_path, "pipe:1", out_npath, self.__threads), self.__progress_event)
+            threads = max((self.__threads or cpu_count()) // min(len(segments), Var.FF_SEGMENTS), 1)
+            parts, slots = {}, Semaphore(Var.FF_SEGMENTS)
+            LOGS.info(f"Encoding {len(segments)} Segments of ~{seg_time}s with {threads} Threads Each")
+
+            async def encode_segment(index, segment):
+                async def on_event(event):
+                    parts[index] = event
+                    await self.__progress_event({
+                        'out_time': sum(p['out_time'] for p in parts.values()),
+                        'total_size': sum(p['total_size'] for p in parts.values()),
+                        'fps': round(sum(p['fps'] for p in parts.values() if not p['end']), 2),
+                        'speed': round(sum(p['speed'] for p in parts.values() if not p['end']), 2),
+                        'bitrate': 'N/A', 'end': False,
+                    })
+                async with slots:
+                    if self.is_cancelled:
+                        return -1, b""
+                    return await self.__run(['ffmpeg', '-hide_banner', '-i', ospath.join(work_dir, segment), '-progress', 'pipe:1',
+                                             '-map', '0:v:0', *profile.video_args(threads=threads),
+                                             ospath.join(work_dir, segment.replace('in_', 'out_', 1)), '-y'], on_event)
+
+            for return_code, stderr in await gather(*(encode_segment(i, seg) for i, seg in enumerate(segments))):
+                if return_code != 0:
+                    return return_code, stderr
+
+            concat_list = ospath.join(work_dir, 'concat.txt')
+            async with aiopen(concat_list, 'w') as f:
+                for segment in segments:
+                    seg_path = ospath.abspath(ospath.join(work_dir, segment.replace('in_', 'out_', 1))).replace("'", "'\\''")
+                    await f.write(f"file '{seg_path}'\n")
+            return await self.__run(['ffmpeg', '-hide_banner', '-f', 'concat', '-safe', '0', '-i', concat_list, '-i', self.dl_path,
+                                     '-map', '0:v', '-map', '1', '-map', '-1:v', '-c', 'copy', out_npath, '-y'])
+        finally:
+            await aiormtree(work_dir, ignore_errors=True)
+
+    def __render(self):
+        st = self.stats
+        bar = floor(st['percent']/8)*"█" + (12 - floor(st['percent']/8))*"▒"
+        return f"""<blockquote>‣ <b>Anime Name :</b> <b><i>{self.__name}</i></b></blockquote>
 <blockquote>‣ <b>Status :</b> <i>Encoding</i>
-    <code>[{bar}]</code> {percent}%</blockquote> 
-<blockquote>   ‣ <b>Size :</b> {convertBytes(ensize)} out of ~ {convertBytes(tsize)}
-    ‣ <b>Speed :</b> {convertBytes(speed)}/s
-    ‣ <b>Time Took :</b> {convertTime(diff)}
-    ‣ <b>Time Left :</b> {convertTime(eta)}</blockquote>
+    <code>[{bar}]</code> {st['percent']}%</blockquote> 
+<blockquote>   ‣ <b>Size :</b> {convertBytes(st['ensize'])} out of ~ {convertBytes(st['tsize'])}
+    ‣ <b>Speed :</b> {convertBytes(st['speed'])}/s ( {st['fps']} fps, {st['enc_speed']}x )
+    ‣ <b>Time Took :</b> {convertTime(st['diff'])}
+    ‣ <b>Time Left :</b> {convertTime(st['eta'])}</blockquote>
 <blockquote>‣ <b>File(s) Encoded:</b> <code>{Var.QUALS.index(self.__qual)} / {len(Var.QUALS)}</code></blockquote>"""
-            
-                await editMessage(self.message, progress_str)
-                if (prog := findall(r"progress=(\w+)", text)) and prog[-1] == 'end':
-                    break
-            await asleep(8)
     
     async def start_encode(self):
-        if ospath.exists(self.__prog_file):
-            await aioremove(self.__prog_file)
-    
-        async with aiopen(self.__prog_file, 'w+'):
-            LOGS.info("Progress Temp Generated !")
-            pass
-        
-        dl_npath, out_npath = ospath.join("encode", "ffanimeadvin.mkv"), ospath.join("encode", "ffanimeadvout.mkv")
-        await aiorename(self.dl_path, dl_npath)
-        
-        ffcode = ffargs[self.__qual].format(dl_npath, self.__prog_file, out_npath)
-        
-        LOGS.info(f'FFCode: {ffcode}')
-        self.__proc = await create_subprocess_shell(ffcode, stdout=PIPE, stderr=PIPE)
-        proc_pid = self.__proc.pid
-        ffpids_cache.append(proc_pid)
-        _, return_code = await gather(create_task(self.progress()), self.__proc.wait())
-        ffpids_cache.remove(proc_pid)
+        out_npath = ospath.join("encode", f"ffanimeadvout_{self.__job_id}.mkv")
+        profile = ffprofiles[self.__qual]
+        self.__total_time = await mediainfo(self.__probe_path, get_duration=True)
+        if isinstance(self.__total_time, str) or not self.__total_time:
+            self.__total_time = 1.0
         
-        await aiorename(dl_npath, self.dl_path)
+        try:
+            if self.__streamed:
+                return_code, stderr = await self.__run(profile.command(self.dl_path, "pipe:1", out_npath, self.__threads), self.__progress_event)
+            elif Var.FF_REMUX and profile.can_remux(await ffprobe(self.dl_path)):
+                await rep.report(f"Source Already Matches {self.__qual}p Profile, Remuxing without Re-Encode...", "info")
+                return_code, stderr = await self.__run(profile.remux_command(self.dl_path, "pipe:1", out_npath), self.__progress_event)
+            elif Var.FF_SEGMENTS > 1 and not profile.template and self.__total_time >= Var.FF_SEGMENTS * 30:
+                return_code, stderr = await self.__encode_segments(profile, out_npath)
+            else:
+                return_code, stderr = await self.__run(profile.command(self.dl_path, "pipe:1", out_npath, self.__threads), self.__progress_event)
+        finally:
+            self.stats['done'] = True
         
         if self.is_cancelled:
-            return
+            raise RuntimeError(f"{self.__qual}p Encode Cancelled")
         
         if return_code == 0:
             if ospath.exists(out_npath):
                 await aiorename(out_npath, self.out_path)
             return self.out_path
-        else:
-            await rep.report((await self.__proc.stderr.read()).decode().strip(), "error")
+        await rep.report(stderr.decode(errors='ignore').strip(), "error")
+        raise RuntimeError(f"{self.__qual}p Encode Failed with Exit Code {return_code}")
             
     async def cancel_encode(self):
         self.is_cancelled = True
-        if self.__proc is not None:
+        for proc in self.__procs:
             try:
-                self.__proc.kill()
+                proc.kill()
             except:
                 pass
+
+class FFParallel:
+    def __init__(self, message, path, names, threads=0):
+        self.message = message
+        self.dl_path = path
+        per_threads = max(threads // len(names), 1) if threads else 0
+        self.encoders = {qual: FFEncoder(message, path, name, qual, per_threads, report=False)
+                          for qual, name in names.items()}
+
+    async def progress(self):
+        while not all(enc.stats['done'] for enc in self.encoders.values()):
+            await asleep(Var.PROGRESS_MIN_INTERVAL)
+            percent = sum(enc.stats['percent'] for enc in self.encoders.values()) / len(self.encoders)
+            await updater.update(self.message, self.__render, percent)
+
+    def __render(self):
+        progress_str = "<blockquote>‣ <b>Status :</b> <i>Encoding Renditions in Parallel</i></blockquote>"
+        for qual, enc in self.encoders.items():
+            st = enc.stats
+            bar = floor(st['percent']/8)*"█" + (12 - floor(st['percent']/8))*"▒"
+            progress_str += f"""
+<blockquote>‣ <b>{qual}p :</b> <i>{enc.name}</i>
+    <code>[{bar}]</code> {st['percent']}%
+    ‣ <b>Size :</b> {convertBytes(st['ensize'])} out of ~ {convertBytes(st['tsize'])}
+    ‣ <b>Speed :</b> {convertBytes(st['speed'])}/s ( {st['fps']} fps, {st['enc_speed']}x )
+    ‣ <b>Time Left :</b> {convertTime(st['eta'])}</blockquote>"""
+        progress_str += f"\n<blockquote>‣ <b>File(s) Encoded:</b> <code>{sum(enc.stats['done'] for enc in self.encoders.values())} / {len(self.encoders)}</code></blockquote>"
+        return progress_str
+
+    async def start_encode(self):
+        prog_task = create_task(self.progress())
+        enc_tasks = [create_task(enc.start_encode()) for enc in self.encoders.values()]
+        try:
+            out_paths = await gather(*enc_tasks)
+        except BaseException:
+            for task in enc_tasks:
+                task.cancel()
+            await gather(*enc_tasks, return_exceptions=True)
+            raise
+        finally:
+            prog_task.cancel()
+        return dict(zip(self.encoders.keys(), out_paths))
+
+    async def cancel_encode(self):
+        await gather(*(enc.cancel_encode() for enc in self.encoders.values()))
@@ -0,0 +1,120 @@
+from os import getenv
+from time import time
+from shlex import split as ssplit
+from asyncio import create_subprocess_exec
+from asyncio.subprocess import DEVNULL, PIPE
+
+from bot import Var, LOGS
+from .ffqueue import ffQueue
+from .reporter import rep
+
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow']
+RESOLUTIONS = {'2160': '3840x2160', '1440': '2560x1440', '1080': '1920x1080', '720': '1280x720', '480': '854x480', '360': '640x360'}
+CODEC_TAGS = {'libx265': 'HEVC', 'libaom-av1': 'AV1', 'libsvtav1': 'AV1'}
+CODEC_NAMES = {'libx264': 'h264', 'libx265': 'hevc', 'libaom-av1': 'av1', 'libsvtav1': 'av1'}
+
+class FFProfile:
+    def __init__(self, qual, codec='libx264', preset='veryfast', crf=30, tune='', params='', template=None):
+        self.qual = qual
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.tune = tune
+        self.params = params
+        self.template = template
+        self.pinned = bool(template)
+
+    @classmethod
+    def from_env(cls, qual):
+        if template := getenv(f"FFCODE_{qual}"):
+            codec = next((codec for codec in CODEC_TAGS if codec in template), 'libx264')
+            return cls(qual, codec=codec, template=template)
+        profile = cls(qual,
+                      codec=getenv(f"FF_CODEC_{qual}") or Var.FF_CODEC,
+                      preset=getenv(f"FF_PRESET_{qual}") or Var.FF_PRESET or ('superfast' if qual == '720' else 'veryfast'),
+                      crf=int(getenv(f"FF_CRF_{qual}") or Var.FF_CRF),
+                      tune=getenv(f"FF_TUNE_{qual}") or Var.FF_TUNE,
+                      params=getenv(f"FF_PARAMS_{qual}") or Var.FF_PARAMS)
+        profile.pinned = bool(getenv(f"FF_PRESET_{qual}") or Var.FF_PRESET)
+        return profile
+
+    @property
+    def codec_tag(self):
+        return CODEC_TAGS.get(self.codec, '')
+
+    @property
+    def resolution(self):
+        return RESOLUTIONS.get(self.qual) or f"{round(int(self.qual) * 8 / 9) * 2}x{self.qual}"
+
+    def video_args(self, preset=None, threads=0):
+        args = ['-c:v', self.codec, '-preset', preset or self.preset, '-crf', str(self.crf)]
+        if self.tune:
+            args += ['-tune', self.tune]
+        if self.params and self.codec in ('libx264', 'libx265'):
+            args += [f"-{self.codec[3:]}-params", self.params]
+        args += ['-pix_fmt', 'yuv420p', '-s', self.resolution]
+        if self.codec == 'libx264':
+            args += ['-level', '3.1']
+        if threads:
+            args += ['-threads', str(threads)]
+        return args
+
+    def command(self, in_path, prog_path, out_path, threads=0):
+        if self.template:
+            args, fills, out_index = [], [in_path, prog_path, out_path], None
+            for arg in ssplit(self.template):
+                if '{}' in arg and fills:
+                    if len(fills) == 1:
+                        out_index = len(args)
+                    arg = arg.format(fills.pop(0))
+                args.append(arg)
+            if threads and out_index is not None:
+                args[out_index:out_index] = ['-threads', str(threads)]
+            return args
+        return ['ffmpeg', '-hide_banner', '-i', in_path, '-progress', prog_path, '-map', '0',
+                *self.video_args(threads=threads), '-c:a', 'copy', '-c:s', 'copy', out_path, '-y']
+
+    def can_remux(self, probe):
+        if not (video := next((st for st in probe.get('streams', []) if st.get('codec_type') == 'video'
+                                and not st.get('disposition', {}).get('attached_pic')), None)):
+            return False
+        max_kbps = int(getenv(f"FF_REMUX_KBPS_{self.qual}") or Var.FF_REMUX_KBPS)
+        bitrate = int(video.get('bit_rate') or probe.get('format', {}).get('bit_rate') or 0) // 1000
+        return video.get('codec_name') == CODEC_NAMES.get(self.codec) \
+            and str(video.get('height')) == self.resolution.split('x')[-1] \
+            and video.get('pix_fmt') == 'yuv420p' \
+            and (not max_kbps or 0 < bitrate <= max_kbps)
+
+    def remux_command(self, in_path, prog_path, out_path):
+        return ['ffmpeg', '-hide_banner', '-i', in_path, '-progress', prog_path, '-map', '0', '-c', 'copy', out_path, '-y']
+
+    async def benchmark(self, preset, seconds, threads=0):
+        args = ['ffmpeg', '-hide_banner', '-f', 'lavfi', '-i', f"testsrc2=size={RESOLUTIONS.get(self.qual, '1280x720')}:rate=24",
+                '-t', str(seconds), *self.video_args(preset, threads), '-f', 'null', '-']
+        start = time()
+        proc = await create_subprocess_exec(*args, stdout=DEVNULL, stderr=PIPE)
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(stderr.decode(errors='ignore').strip()[-500:])
+        return seconds / max(time() - start, 0.01)
+
+    async def calibrate(self, target, seconds, threads=0):
+        if self.pinned or self.codec not in ('libx264', 'libx265'):
+            return self.preset
+        for preset in reversed(PRESETS[:PRESETS.index('medium') + 1]):
+            speed = await self.benchmark(preset, seconds, threads)
+            LOGS.info(f"FF Calibration {self.qual}p {self.codec} {preset}: {round(speed, 2)}x Realtime")
+            if speed >= target:
+                break
+        self.preset = preset
+        return preset
+
+ffprofiles = {qual: FFProfile.from_env(qual) for qual in Var.QUALS}
+
+async def calibrate_profiles():
+    for qual, profile in ffprofiles.items():
+        try:
+            preset = await profile.calibrate(Var.FF_TARGET_SPEED, Var.FF_CALIBRATE_SECONDS, ffQueue.threads)
+            await rep.report(f"Encoder Profile {qual}p: {profile.codec} -preset {preset} -crf {profile.crf}", "info")
+        except Exception as e:
+            await rep.report(f"Encoder Calibration Failed for {qual}p: {e}", "error")
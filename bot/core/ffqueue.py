@@ -0,0 +1,101 @@
+from time import time
+from asyncio import Event, create_task
+from multiprocessing import cpu_count
+
+from bot import Var, bot_loop, LOGS
+
+class FFQueue:
+    def __init__(self, workers=1, threads=0, aging=1800):
+        self.workers = max(workers, 1)
+        self.threads = max((threads or cpu_count()) // self.workers, 1) if self.workers > 1 else threads
+        self.aging = aging
+        self.__active = set()
+        self.__waiting = {}
+        self.__idle = Event()
+        self.__idle.set()
+
+    @property
+    def active(self):
+        return list(self.__active)
+
+    @property
+    def waiting(self):
+        return [post_id for post_id, _ in self.__ordered()]
+
+    def empty(self):
+        return not (self.__active or self.__waiting)
+
+    def __score(self, task):
+        return task['priority'] + ((time() - task['queued']) / self.aging if self.aging else 0)
+
+    def __ordered(self):
+        return sorted(self.__waiting.items(), key=lambda item: (-self.__score(item[1]), item[1]['queued']))
+
+    def position(self, post_id):
+        for pos, wid in enumerate(self.waiting, start=1):
+            if wid == post_id:
+                return pos
+        return 0
+
+    def info(self):
+        return [(post_id, task['name'], task['priority'], round(self.__score(task), 2)) for post_id, task in self.__ordered()]
+
+    def set_priority(self, post_id, priority=None):
+        if not (task := self.__waiting.get(post_id)):
+            return False
+        if priority is None:
+            priority = max((self.__score(t) for t in self.__waiting.values()), default=0) + 1
+        task['priority'] = priority
+        self.__notify()
+        return True
+
+    async def acquire(self, post_id, notify=None, priority=0, name=""):
+        self.__idle.clear()
+        if len(self.__active) < self.workers and not self.__waiting:
+            self.__active.add(post_id)
+            return self.threads
+        future = bot_loop.create_future()
+        self.__waiting[post_id] = {'future': future, 'notify': notify, 'priority': priority, 'queued': time(), 'name': name}
+        LOGS.info(f"Encode Task {post_id} Queued at Position {self.position(post_id)} with Priority {priority}")
+        self.__notify()
+        try:
+            await future
+        except BaseException:
+            self.__remove(post_id)
+            raise
+        return self.threads
+
+    def release(self, post_id):
+        self.__active.discard(post_id)
+        self.__wake()
+
+    def __remove(self, post_id):
+        self.__waiting.pop(post_id, None)
+        self.__active.discard(post_id)
+        self.__wake()
+
+    def __notify(self):
+        for pos, (_, task) in enumerate(self.__ordered(), start=1):
+            if task['notify'] and task.get('pos') != pos:
+                task['pos'] = pos
+                create_task(task['notify'](pos))
+
+    def __wake(self):
+        woken = False
+        while self.__waiting and len(self.__active) < self.workers:
+            post_id, task = self.__ordered()[0]
+            del self.__waiting[post_id]
+            if task['future'].done():
+                continue
+            self.__active.add(post_id)
+            task['future'].set_result(True)
+            woken = True
+        if woken:
+            self.__notify()
+        if self.empty():
+            self.__idle.set()
+
+    async def join(self):
+        await self.__idle.wait()
+
+ffQueue = FFQueue(Var.ENCODE_WORKERS, Var.FF_THREADS, Var.QUEUE_AGING)
@@ -0,0 +1,56 @@
+from pyrogram.errors import FileReferenceExpired, FileReferenceInvalid, MediaEmpty
+
+from bot import bot, Var
+from .cache_utils import TTLCache
+from .ratelimit import tglimiter
+
+class FileStore:
+    def __init__(self, ttl, maxsize=1024, neg_ttl=300):
+        self.__neg_ttl = neg_ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.fetched = 0
+
+    @staticmethod
+    def entry(msg):
+        if not msg or msg.empty:
+            return {}
+        if msg.media and (media := getattr(msg, msg.media.value, None)) and hasattr(media, 'file_id'):
+            return {'file_id': media.file_id, 'caption': msg.caption.html if msg.caption else None, 'media': msg.media.value}
+        if msg.text:
+            return {'text': msg.text.html}
+        return {}
+
+    async def resolve(self, msg_ids):
+        found, missing = {}, []
+        for msg_id in msg_ids:
+            if (data := self.memory.get(msg_id)) is not None:
+                found[msg_id] = data
+            else:
+                missing.append(msg_id)
+        for i in range(0, len(missing), 200):
+            chunk = missing[i:i+200]
+            msgs = await tglimiter.call(None, bot.get_messages, Var.FILE_STORE, message_ids=chunk)
+            self.fetched += 1
+            for msg_id, msg in zip(chunk, msgs if isinstance(msgs, list) else [msgs]):
+                found[msg_id] = data = self.entry(msg)
+                self.memory.set(msg_id, data, ttl=None if data else self.__neg_ttl)
+        return {msg_id: found[msg_id] for msg_id in msg_ids}
+
+    async def send(self, chat_id, msg_id, data=None):
+        if data is None:
+            data = (await self.resolve([msg_id]))[msg_id]
+        if not data:
+            return None
+        if 'text' in data:
+            return await tglimiter.call(chat_id, bot.send_message, chat_id, data['text'], disable_web_page_preview=True)
+        try:
+            return await tglimiter.call(chat_id, bot.send_cached_media, chat_id, data['file_id'], caption=data['caption'] or "")
+        except (FileReferenceExpired, FileReferenceInvalid, MediaEmpty):
+            self.memory.pop(msg_id)
+            if (data := (await self.resolve([msg_id]))[msg_id]) and 'file_id' in data:
+                return await tglimiter.call(chat_id, bot.send_cached_media, chat_id, data['file_id'], caption=data['caption'] or "")
+
+    def stats(self):
+        return {**self.memory.stats(), 'fetched': self.fetched}
+
+file_store = FileStore(Var.FILE_CACHE_TTL, Var.FILE_CACHE_SIZE)
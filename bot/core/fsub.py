@@ -0,0 +1,55 @@
+from asyncio import gather, Semaphore
+
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import UserNotParticipant
+
+from bot import bot, Var, LOGS
+from .cache_utils import TTLCache, get_chat
+
+class FSubChecker:
+    LEFT = (ChatMemberStatus.LEFT, ChatMemberStatus.BANNED)
+
+    def __init__(self, ttl=120, info_ttl=21600, concurrency=16, neg_ttl=60):
+        self.members = TTLCache(maxsize=8192, ttl=ttl)
+        self.chats = TTLCache(maxsize=128, ttl=info_ttl)
+        self.failed = TTLCache(maxsize=128, ttl=neg_ttl)
+        self.__sem = Semaphore(concurrency)
+
+    async def is_member(self, uid, chat_id):
+        if (joined := self.members.get((uid, chat_id))) is not None:
+            return joined
+        if chat_id in self.failed:
+            return None
+        async with self.__sem:
+            try:
+                member = await bot.get_chat_member(chat_id=chat_id, user_id=uid)
+                joined = member.status not in self.LEFT
+            except UserNotParticipant:
+                joined = False
+            except Exception as err:
+                LOGS.warning(f"FSub Check Failed for {chat_id}: {err}")
+                self.failed.set(chat_id)
+                return None
+        self.members.set((uid, chat_id), joined)
+        return joined
+
+    async def check(self, uid):
+        return dict(zip(Var.FSUB_CHATS, await gather(*(self.is_member(uid, chat_id) for chat_id in Var.FSUB_CHATS))))
+
+    async def chat_info(self, chat_id):
+        if (info := self.chats.get(chat_id)) is not None:
+            return info
+        async with self.__sem:
+            chat = await get_chat(chat_id)
+            invite = chat.invite_link or (await bot.create_chat_invite_link(chat_id=chat_id)).invite_link
+        info = {'title': chat.title, 'invite': invite}
+        self.chats.set(chat_id, info)
+        return info
+
+    def update(self, uid, chat_id, status=None):
+        if status is None:
+            self.members.pop((uid, chat_id))
+        else:
+            self.members.set((uid, chat_id), status not in self.LEFT)
+
+fsub = FSubChecker(Var.FSUB_TTL)
@@ -1,26 +1,27 @@
-from multiprocessing import cpu_count
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial, wraps
+from functools import wraps
 from json import loads as jloads
 from re import findall
 from math import floor
 from os import path as ospath
-from time import time, sleep
+from time import time
 from traceback import format_exc
-from asyncio import sleep as asleep, create_subprocess_shell
+from asyncio import sleep as asleep, gather, create_subprocess_shell, create_subprocess_exec
 from asyncio.subprocess import PIPE
 from base64 import urlsafe_b64encode, urlsafe_b64decode
 
-from aiohttp import ClientSession
 from aiofiles import open as aiopen
+from aiofiles.os import remove as aioremove, listdir
 from aioshutil import rmtree as aiormtree
 from html_telegraph_poster import TelegraphPoster
 from feedparser import parse as feedparse
 from pyrogram.enums import ChatMemberStatus
 from pyrogram.types import InlineKeyboardButton
-from pyrogram.errors import MessageNotModified, FloodWait, UserNotParticipant, ReplyMarkupInvalid, MessageIdInvalid
+from pyrogram.errors import MessageNotModified, ReplyMarkupInvalid, MessageIdInvalid
 
-from bot import bot, bot_loop, LOGS, Var
+from bot import bot, bot_loop, bot_info, LOGS, Var, http_client
+from .executors import executors
+from .ratelimit import tglimiter
+from .fsub import fsub
 from .reporter import rep
 
 def handle_logs(func):
@@ -32,9 +33,8 @@ def handle_logs(func):
             await rep.report(format_exc(), "error")
     return wrapper
     
-async def sync_to_async(func, *args, wait=True, **kwargs):
-    pfunc = partial(func, *args, **kwargs)
-    future = bot_loop.run_in_executor(ThreadPoolExecutor(max_workers=cpu_count() * 125), pfunc)
+async def sync_to_async(func, *args, wait=True, pool='io', **kwargs):
+    future = bot_loop.create_task(executors[pool].run(func, *args, **kwargs))
     return await future if wait else future
     
 def new_task(func):
@@ -55,9 +55,8 @@ async def getfeed(link, index=0):
 
 @handle_logs
 async def aio_urldownload(link):
-    async with ClientSession() as sess:
-        async with sess.get(link) as data:
-            image = await data.read()
+    async with http_client.session.get(link) as data:
+        image = await data.read()
     path = f"thumbs/{link.split('/')[-1]}"
     if not path.endswith((".jpg" or ".png")):
         path += ".jpg"
@@ -84,15 +83,11 @@ async def get_telegraph(out):
 async def sendMessage(chat, text, buttons=None, get_error=False, **kwargs):
     try:
         if isinstance(chat, int):
-            return await bot.send_message(chat_id=chat, text=text, disable_web_page_preview=True,
+            return await tglimiter.call(chat, bot.send_message, chat_id=chat, text=text, disable_web_page_preview=True,
                                         disable_notification=False, reply_markup=buttons, **kwargs)
         else:
-            return await chat.reply(text=text, quote=True, disable_web_page_preview=True, disable_notification=False,
+            return await tglimiter.call(chat.chat.id, chat.reply, text=text, quote=True, disable_web_page_preview=True, disable_notification=False,
                                     reply_markup=buttons, **kwargs)
-    except FloodWait as f:
-        await rep.report(f, "warning")
-        sleep(f.value * 1.2)
-        return await sendMessage(chat, text, buttons, get_error, **kwargs)
     except ReplyMarkupInvalid:
         return await sendMessage(chat, text, None, get_error, **kwargs)
     except Exception as e:
@@ -105,12 +100,8 @@ async def editMessage(msg, text, buttons=None, get_error=False, **kwargs):
     try:
         if not msg:
             return None
-        return await msg.edit_text(text=text, disable_web_page_preview=True, 
+        return await tglimiter.coalesce((msg.chat.id, msg.id), msg.chat.id, msg.edit_text, text=text, disable_web_page_preview=True, 
                                         reply_markup=buttons, **kwargs)
-    except FloodWait as f:
-        await rep.report(f, "warning")
-        sleep(f.value * 1.2)
-        return await editMessage(msg, text, buttons, get_error, **kwargs)
     except ReplyMarkupInvalid:
         return await editMessage(msg, text, None, get_error, **kwargs)
     except (MessageNotModified, MessageIdInvalid):
@@ -130,34 +121,25 @@ async def decode(b64_str):
 async def is_fsubbed(uid):
     if len(Var.FSUB_CHATS) == 0:
         return True
-    for chat_id in Var.FSUB_CHATS:
-        try:
-            member = await bot.get_chat_member(chat_id=chat_id, user_id=uid)
-        except UserNotParticipant:
-            return False
-        except Exception as err:
-            await rep.report(format_exc(), "warning")
-            continue
-    return True
+    return all(joined is not False for joined in (await fsub.check(uid)).values())
         
 async def get_fsubs(uid, txtargs):
     txt = "<b><i>Please Join Following Channels to Use this Bot!</i></b>\n\n"
     btns = []
-    for no, chat in enumerate(Var.FSUB_CHATS, start=1):
-        try:
-            cha = await bot.get_chat(chat)
-            member = await bot.get_chat_member(chat_id=chat, user_id=uid)
+    statuses = await fsub.check(uid)
+    infos = await gather(*(fsub.chat_info(chat) for chat in Var.FSUB_CHATS), return_exceptions=True)
+    for no, (chat, cha) in enumerate(zip(Var.FSUB_CHATS, infos), start=1):
+        if isinstance(cha, Exception) or (joined := statuses.get(chat)) is None:
+            await rep.report(f"FSub Chat {chat} Unavailable: {cha}", "warning")
+            continue
+        if joined:
             sta = "Joined ✅️"
-        except UserNotParticipant:
+        else:
             sta = "Not Joined ❌️"
-            inv = await bot.create_chat_invite_link(chat_id=chat)
-            btns.append([InlineKeyboardButton(cha.title, url=inv.invite_link)])
-        except Exception as err:
-            await rep.report(format_exc(), "warning")
-            continue
-        txt += f"<b>{no}. Title :</b> <i>{cha.title}</i>\n  <b>Status :</b> <i>{sta}</i>\n\n"
+            btns.append([InlineKeyboardButton(cha['title'], url=cha['invite'])])
+        txt += f"<b>{no}. Title :</b> <i>{cha['title']}</i>\n  <b>Status :</b> <i>{sta}</i>\n\n"
     if len(txtargs) > 1:
-        btns.append([InlineKeyboardButton('🗂 Get Files', url=f'https://t.me/{(await bot.get_me()).username}?start={txtargs[1]}')])
+        btns.append([InlineKeyboardButton('🗂 Get Files', url=bot_info.link(txtargs[1]))])
     return txt, btns
 
 async def mediainfo(file, get_json=False, get_duration=False):
@@ -169,7 +151,7 @@ async def mediainfo(file, get_json=False, get_duration=False):
         stdout, _ = await process.communicate()
         if get_duration:
             try:
-                return float(jloads(stdout.decode())['media']['track'][0]['Duration'])
+                return float((await sync_to_async(jloads, stdout.decode(), pool='cpu'))['media']['track'][0]['Duration'])
             except Exception:
                 return 1440 # 24min
         return await get_telegraph(stdout.decode())
@@ -177,9 +159,25 @@ async def mediainfo(file, get_json=False, get_duration=False):
         await rep.report(format_exc(), "error")
         return ""
         
+async def ffprobe(file):
+    try:
+        process = await create_subprocess_exec('ffprobe', '-v', 'error', '-print_format', 'json', '-show_streams', '-show_format', file, stdout=PIPE, stderr=PIPE)
+        stdout, _ = await process.communicate()
+        return await sync_to_async(jloads, stdout.decode(), pool='cpu')
+    except Exception:
+        await rep.report(format_exc(), "error")
+        return {}
+        
 async def clean_up():
     try:
-        (await aiormtree(dirtree) for dirtree in ("downloads", "thumbs", "encode"))
+        await aiormtree("thumbs", ignore_errors=True)
+        if ospath.isdir("encode"):
+            for item in await listdir("encode"):
+                if item.startswith(("ffanimeadvout_", "stream_", "segments_")):
+                    if ospath.isdir(item := ospath.join("encode", item)):
+                        await aiormtree(item, ignore_errors=True)
+                    else:
+                        await aioremove(item)
     except Exception as e:
         LOGS.error(str(e))
 
@@ -0,0 +1,127 @@
+from os import path as ospath
+from asyncio import Event
+from aiofiles.os import remove as aioremove
+from datetime import datetime, timedelta
+
+from bot import Var
+from .database import db
+from .cache_utils import TTLCache
+
+class JobJournal:
+    STATES = ('discovered', 'downloading', 'queued', 'encoding', 'uploading', 'done', 'failed')
+    FINAL = ('done', 'failed')
+
+    def __init__(self, flush_parts=32, retention=30):
+        self.__flush_parts = flush_parts
+        self.__retention = retention
+        self.__parts = {}
+        self.__running = set()
+        self.__idle = Event()
+        self.__idle.set()
+        self.__states = TTLCache(maxsize=512, ttl=3600)
+
+    @staticmethod
+    def key(ani_id, ep_no, name):
+        return f"{ani_id}:{ep_no}" if ani_id and ep_no else name
+
+    @property
+    def running(self):
+        return len(self.__running)
+
+    def claim(self, key):
+        if key in self.__running:
+            return False
+        self.__running.add(key)
+        self.__idle.clear()
+        return True
+
+    def release(self, key):
+        self.__running.discard(key)
+        if not self.__running:
+            self.__idle.set()
+
+    async def join(self):
+        await self.__idle.wait()
+
+    async def states(self, key):
+        if (states := self.__states.get(key)) is None:
+            states = {qual: task['state'] for qual, task in (await db.getJobTasks(key)).items()}
+            self.__states.set(key, states)
+        return states
+
+    async def is_done(self, key):
+        states = await self.states(key)
+        return all(states.get(qual) == 'done' for qual in Var.QUALS)
+
+    async def pending(self):
+        return await db.getActiveJobs(self.FINAL)
+
+    async def start(self, key, name, torrent, force=False):
+        await db.saveJob(key, {'name': name, 'torrent': torrent, 'force': force},
+                         unset=('expires', 'dl', 'post_id', 'stat_id', 'up_id') if force else ('expires',))
+        await db.addJobTasks(key, Var.QUALS, 'discovered')
+        if force:
+            await self.set_state(key, Var.QUALS, 'discovered', skip=(), unset=('msg_id', 'out', 'upload'))
+        else:
+            await self.set_state(key, Var.QUALS, 'discovered')
+
+    async def update(self, key, **fields):
+        await db.saveJob(key, fields)
+
+    async def set_state(self, key, quals, state, skip=('done',), unset=(), **fields):
+        if state in self.FINAL:
+            fields['expires'] = datetime.utcnow() + timedelta(days=self.__retention)
+        else:
+            unset = (*unset, 'expires')
+        await db.saveJobTasks(key, quals, {'state': state, **fields}, unset, skip)
+        states = await self.states(key)
+        for qual in quals:
+            if states.get(qual) not in skip:
+                states[qual] = state
+
+    async def rendition(self, key, qual, **fields):
+        await db.saveJobTasks(key, [qual], fields)
+
+    async def upload(self, key, qual, path, file_id):
+        await self.set_state(key, [qual], 'uploading', upload={'path': path, 'file_id': file_id, 'parts': []})
+
+    def resumable(self, task, path):
+        upload = (task or {}).get('upload')
+        if upload and upload.get('path') == path and ospath.exists(path):
+            return upload['file_id'], upload.get('parts', [])
+        return None, []
+
+    def tracker(self, key, qual):
+        async def on_part(part):
+            parts = self.__parts.setdefault((key, qual), [])
+            parts.append(part)
+            if len(parts) >= self.__flush_parts:
+                await self.flush(key, qual)
+        return on_part
+
+    async def flush(self, key, qual):
+        if parts := self.__parts.pop((key, qual), None):
+            await db.ackJobParts(key, qual, parts)
+
+    async def uploaded(self, key, qual, msg_id):
+        self.__parts.pop((key, qual), None)
+        await self.set_state(key, [qual], 'done', unset=('upload',), msg_id=msg_id)
+
+    async def __cleanup(self, key):
+        for task in (await db.getJobTasks(key)).values():
+            for path in {task.get('out'), (task.get('upload') or {}).get('path')}:
+                if path and ospath.exists(path):
+                    try:
+                        await aioremove(path)
+                    except OSError:
+                        pass
+
+    async def fail(self, key):
+        await self.set_state(key, Var.QUALS, 'failed', skip=self.FINAL)
+        await self.finish(key)
+
+    async def finish(self, key):
+        await db.saveJob(key, {'expires': datetime.utcnow() + timedelta(days=self.__retention)})
+        await self.__cleanup(key)
+
+journal = JobJournal(retention=Var.JOB_RETENTION)
@@ -0,0 +1,164 @@
+from os import open as osopen, close as osclose, pread, O_RDONLY, path as ospath
+from math import ceil
+from time import monotonic
+from collections import deque
+from asyncio import Queue, gather, sleep as asleep, iscoroutinefunction
+
+from pyrogram import raw, types, utils
+from pyrogram.session import Session
+from pyrogram.errors import FloodWait, FilePartMissing
+
+from bot import bot_loop, LOGS
+from .ratelimit import tglimiter
+from .func_utils import sync_to_async
+
+MAX_PART_SIZE = 512 * 1024
+BIG_FILE_SIZE = 10 * 1024 * 1024
+
+def part_size(kb):
+    size = kb * 1024
+    if size <= 0 or MAX_PART_SIZE % size:
+        return MAX_PART_SIZE
+    return size
+
+class PartUploader:
+    def __init__(self, client, sessions=4, workers=4, part_kb=512, retries=5):
+        self.__client = client
+        self.sessions = max(sessions, 1)
+        self.workers = max(workers, 1)
+        self.part_size = part_size(part_kb)
+        self.__retries = retries
+        self.__sessions = []
+        self.__window = deque(maxlen=64)
+        self.__start = monotonic()
+        self.file_id = None
+        self.total_parts = 0
+        self.file_size = 0
+        self.uploaded = 0
+        self.acked = set()
+
+    @property
+    def speed(self):
+        if len(self.__window) < 2:
+            elapsed = monotonic() - self.__start
+            return self.uploaded / elapsed if elapsed > 0 else 0
+        (t0, b0), (t1, b1) = self.__window[0], self.__window[-1]
+        return (b1 - b0) / (t1 - t0) if t1 > t0 else 0
+
+    @property
+    def elapsed(self):
+        return monotonic() - self.__start
+
+    async def __start_sessions(self):
+        dc_id, auth_key, test_mode = await self.__client.storage.dc_id(), await self.__client.storage.auth_key(), await self.__client.storage.test_mode()
+        self.__sessions = [Session(self.__client, dc_id, auth_key, test_mode, is_media=True) for _ in range(self.sessions)]
+        await gather(*(session.start() for session in self.__sessions))
+
+    async def __stop_sessions(self):
+        await gather(*(session.stop() for session in self.__sessions), return_exceptions=True)
+        self.__sessions.clear()
+
+    async def __save_part(self, session, fd, part):
+        chunk = await sync_to_async(pread, fd, self.part_size, part * self.part_size)
+        rpc = raw.functions.upload.SaveBigFilePart(file_id=self.file_id, file_part=part,
+                                                   file_total_parts=self.total_parts, bytes=chunk)
+        for attempt in range(self.__retries):
+            try:
+                await session.invoke(rpc)
+                return len(chunk)
+            except FloodWait as e:
+                await asleep(e.value * 1.2)
+            except (OSError, TimeoutError) as e:
+                LOGS.warning(f"Part {part} of {self.file_id} failed ({attempt + 1}/{self.__retries}): {e}")
+                await asleep(2 ** attempt)
+        raise RuntimeError(f"Part {part} of {self.file_id} failed after {self.__retries} attempts")
+
+    async def __worker(self, session, fd, parts, progress, on_part):
+        while (part := await parts.get()) is not None:
+            size = await self.__save_part(session, fd, part)
+            self.acked.add(part)
+            self.uploaded += size
+            self.__window.append((monotonic(), self.uploaded))
+            if on_part:
+                await on_part(part)
+            if progress:
+                if iscoroutinefunction(progress):
+                    await progress(min(self.uploaded, self.file_size), self.file_size)
+                else:
+                    progress(min(self.uploaded, self.file_size), self.file_size)
+
+    async def save_file(self, path, progress=None, file_id=None, acked=None, on_part=None):
+        self.file_size = ospath.getsize(path)
+        if self.file_size <= BIG_FILE_SIZE:
+            return await self.__client.save_file(path, progress=progress)
+        self.file_id = file_id or self.__client.rnd_id()
+        self.total_parts = ceil(self.file_size / self.part_size)
+        self.acked = set(acked or ())
+        self.uploaded = sum(min(self.part_size, self.file_size - p * self.part_size) for p in self.acked)
+        self.__start, self.__window = monotonic(), deque([(monotonic(), self.uploaded)], maxlen=64)
+
+        parts = Queue()
+        for part in range(self.total_parts):
+            if part not in self.acked:
+                parts.put_nowait(part)
+        workers = self.sessions * self.workers
+        for _ in range(workers):
+            parts.put_nowait(None)
+
+        fd = osopen(path, O_RDONLY)
+        try:
+            await self.__start_sessions()
+            tasks = [bot_loop.create_task(self.__worker(session, fd, parts, progress, on_part))
+                     for session in self.__sessions for _ in range(self.workers)]
+            try:
+                await gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await gather(*tasks, return_exceptions=True)
+                raise
+        finally:
+            await self.__stop_sessions()
+            osclose(fd)
+        return raw.types.InputFileBig(id=self.file_id, parts=self.total_parts, name=ospath.basename(path))
+
+    async def __resend_part(self, path, part):
+        fd = osopen(path, O_RDONLY)
+        session = Session(self.__client, await self.__client.storage.dc_id(), await self.__client.storage.auth_key(),
+                          await self.__client.storage.test_mode(), is_media=True)
+        try:
+            await session.start()
+            await self.__save_part(session, fd, part)
+        finally:
+            await session.stop()
+            osclose(fd)
+
+    async def send(self, chat_id, path, caption="", thumb=None, as_doc=True, duration=0, progress=None,
+                   file_id=None, acked=None, on_part=None):
+        file = await self.save_file(path, progress, file_id, acked, on_part)
+        thumb = await self.__client.save_file(thumb) if thumb else None
+        name = ospath.basename(path)
+        attributes = [raw.types.DocumentAttributeFilename(file_name=name)]
+        if not as_doc:
+            attributes.insert(0, raw.types.DocumentAttributeVideo(duration=duration, w=0, h=0, supports_streaming=True))
+        media = raw.types.InputMediaUploadedDocument(
+            mime_type=self.__client.guess_mime_type(name) or "video/x-matroska",
+            file=file, thumb=thumb, force_file=as_doc or None, attributes=attributes
+        )
+        while True:
+            rpc = raw.functions.messages.SendMedia(
+                peer=await self.__client.resolve_peer(chat_id), media=media, random_id=self.__client.rnd_id(),
+                **await utils.parse_text_entities(self.__client, caption, None, None)
+            )
+            try:
+                r = await tglimiter.call(chat_id, self.__client.invoke, rpc)
+            except FilePartMissing as e:
+                if not isinstance(file, raw.types.InputFileBig):
+                    raise
+                await self.__resend_part(path, e.value)
+                continue
+            for update in r.updates:
+                if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+                    return await types.Message._parse(self.__client, update.message,
+                                                      {u.id: u for u in r.users}, {c.id: c for c in r.chats})
+            return None
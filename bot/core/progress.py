@@ -0,0 +1,54 @@
+from time import monotonic
+
+from bot import Var
+from .cache_utils import TTLCache
+from .ratelimit import tglimiter
+from .func_utils import editMessage
+
+class ProgressUpdater:
+    def __init__(self, min_interval=5, max_interval=30, threshold=1.0):
+        self.__min = min_interval
+        self.__max = max(max_interval, min_interval)
+        self.__threshold = threshold
+        self.__states = TTLCache(maxsize=256, ttl=6 * 3600)
+        self.skipped = 0
+        self.sent = 0
+
+    def interval(self, chat_id):
+        return self.__min + (self.__max - self.__min) * (1 - tglimiter.headroom(chat_id))
+
+    def __state(self, message):
+        key = (message.chat.id, message.id)
+        if (state := self.__states.get(key)) is None:
+            state = {'text': None, 'percent': None, 'last': 0}
+            self.__states.set(key, state)
+        return state
+
+    def due(self, message):
+        return monotonic() - self.__state(message)['last'] >= self.interval(message.chat.id)
+
+    async def update(self, message, render, percent=None, final=False, buttons=None):
+        if not message:
+            return
+        state = self.__state(message)
+        elapsed = monotonic() - state['last']
+        if not final:
+            if elapsed < self.interval(message.chat.id):
+                return
+            if percent is not None and state['percent'] is not None \
+                and abs(percent - state['percent']) < self.__threshold and elapsed < self.__max:
+                self.skipped += 1
+                return
+        text = render() if callable(render) else render
+        if text == state['text']:
+            self.skipped += 1
+            return
+        state.update(text=text, percent=percent, last=monotonic())
+        self.sent += 1
+        await editMessage(message, text, buttons)
+
+    def clear(self, message):
+        if message:
+            self.__states.pop((message.chat.id, message.id))
+
+updater = ProgressUpdater(Var.PROGRESS_MIN_INTERVAL, Var.PROGRESS_MAX_INTERVAL, Var.PROGRESS_THRESHOLD)
@@ -0,0 +1,101 @@
+from time import monotonic
+from asyncio import sleep as asleep, shield
+
+from pyrogram.errors import FloodWait
+
+from bot import Var, LOGS, bot_loop
+from .cache_utils import TTLCache
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def refill(self):
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        self.refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+class TgLimiter:
+    def __init__(self, global_rate=25, chat_rate=1, group_rate=20, chat_burst=3, idle=3600):
+        self.__global = TokenBucket(global_rate, global_rate)
+        self.__chat_rate = chat_rate
+        self.__chat_burst = max(chat_burst, chat_rate, 1)
+        self.__group_rate = group_rate
+        self.__chats = TTLCache(maxsize=8192, ttl=idle)
+        self.__blocked = TTLCache(maxsize=8192)
+        self.__pending = {}
+
+    def __bucket(self, chat_id):
+        if (bucket := self.__chats.get(chat_id)) is None:
+            if chat_id < 0:
+                bucket = TokenBucket(self.__group_rate / 60, self.__group_rate)
+            else:
+                bucket = TokenBucket(self.__chat_rate, self.__chat_burst)
+        self.__chats.set(chat_id, bucket)
+        return bucket
+
+    def headroom(self, chat_id=None):
+        buckets = [self.__global] + ([self.__bucket(chat_id)] if chat_id is not None else [])
+        for bucket in buckets:
+            bucket.refill()
+        if chat_id is not None and self.__blocked.get(chat_id, 0) > monotonic():
+            return 0.0
+        return min(bucket.tokens / bucket.capacity for bucket in buckets)
+
+    async def acquire(self, chat_id=None):
+        bucket = self.__bucket(chat_id) if chat_id is not None else None
+        while True:
+            wait = max(self.__blocked.get(chat_id, 0) - monotonic(), bucket.delay() if bucket else 0, self.__global.delay())
+            if wait <= 0:
+                if bucket:
+                    bucket.consume()
+                self.__global.consume()
+                return
+            await asleep(wait)
+
+    def flood(self, chat_id, seconds):
+        until = max(self.__blocked.get(chat_id, 0), monotonic() + seconds)
+        self.__blocked.set(chat_id, until, ttl=until - monotonic() + 1)
+
+    async def call(self, chat_id, func, *args, **kwargs):
+        while True:
+            await self.acquire(chat_id)
+            try:
+                return await func(*args, **kwargs)
+            except FloodWait as f:
+                LOGS.warning(f"FloodWait in {chat_id}: Backing Off for {f.value}s")
+                self.flood(chat_id, f.value * 1.2)
+
+    async def coalesce(self, key, chat_id, func, *args, **kwargs):
+        if (entry := self.__pending.get(key)):
+            entry[1:] = [func, args, kwargs]
+            return await shield(entry[0])
+        entry = self.__pending[key] = [None, func, args, kwargs]
+        entry[0] = bot_loop.create_task(self.__flush(key, chat_id, entry))
+        return await shield(entry[0])
+
+    async def __flush(self, key, chat_id, entry):
+        try:
+            await self.acquire(chat_id)
+        finally:
+            self.__pending.pop(key, None)
+        _, func, args, kwargs = entry
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except FloodWait as f:
+                LOGS.warning(f"FloodWait in {chat_id}: Backing Off for {f.value}s")
+                self.flood(chat_id, f.value * 1.2)
+                await self.acquire(chat_id)
+
+tglimiter = TgLimiter(Var.TG_GLOBAL_RATE, Var.TG_CHAT_RATE, Var.TG_GROUP_RATE, Var.TG_CHAT_BURST)
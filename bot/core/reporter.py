@@ -1,6 +1,5 @@
-from time import sleep
-from pyrogram.errors import FloodWait
-from bot import Var, LOGS, bot
+from bot import Var, LOGS, bot, bot_loop
+from .ratelimit import tglimiter
 
 class Reporter:
     def __init__(self, client, chat_id, log):
@@ -19,12 +18,12 @@ class Reporter:
         else:
             self.__logger.info(txt[0])
         if log and self.__cid != 0:
-            try:
-                await self.__client.send_message(self.__cid, f"{txt[0][:4096]}")
-            except FloodWait as f:
-                self.__logger.warning(str(f))
-                sleep(f.value * 1.5)
-            except Exception as err:
-                self.__logger.error(str(err))
+            bot_loop.create_task(self.__send(txt[0]))
+
+    async def __send(self, text):
+        try:
+            await tglimiter.call(self.__cid, self.__client.send_message, self.__cid, f"{text[:4096]}")
+        except Exception as err:
+            self.__logger.error(str(err))
 
 rep = Reporter(bot, Var.LOG_CHANNEL, LOGS)
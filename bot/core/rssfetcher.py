@@ -0,0 +1,101 @@
+from time import time
+from hashlib import md5
+from traceback import format_exc
+
+from aiohttp import ClientTimeout
+from feedparser import parse as feedparse
+
+from bot import Var, LOGS, http_client
+from .database import db
+from .cache_utils import TTLCache
+from .func_utils import sync_to_async
+
+class RSSFetcher:
+    def __init__(self, interval=60):
+        self.__interval = interval
+        self.__feeds = {}
+        self.__seen = TTLCache(maxsize=4096)
+
+    def parse_item(self, item):
+        link, _, interval = item.partition('|')
+        return link, int(interval) if interval.isdigit() else self.__interval
+
+    def __state(self, link):
+        return self.__feeds.setdefault(link, {'etag': None, 'modified': None, 'digest': None, 'next': 0, 'busy': False})
+
+    def due_feeds(self):
+        now, due = time(), []
+        for item in Var.RSS_ITEMS:
+            link, interval = self.parse_item(item)
+            if (state := self.__state(link))['busy'] or state['next'] > now:
+                continue
+            state['next'] = now + interval
+            due.append(link)
+        return due
+
+    async def fetch(self, link):
+        state = self.__state(link)
+        headers = {}
+        if state['etag']:
+            headers['If-None-Match'] = state['etag']
+        if state['modified']:
+            headers['If-Modified-Since'] = state['modified']
+        state['busy'] = True
+        try:
+            async with http_client.session.get(link, headers=headers, timeout=ClientTimeout(total=30)) as resp:
+                if resp.status == 304:
+                    return None
+                if resp.status != 200:
+                    LOGS.error(f"RSS Feed Fetch Failed: {link} | Status: {resp.status}")
+                    return None
+                body = await resp.read()
+                state['etag'] = resp.headers.get('ETag')
+                state['modified'] = resp.headers.get('Last-Modified')
+            if (digest := md5(body).hexdigest()) == state['digest']:
+                return None
+            feed = await sync_to_async(feedparse, body, pool='cpu')
+            state['digest'] = digest
+            return feed.entries
+        except Exception:
+            LOGS.error(format_exc())
+            return None
+        finally:
+            state['busy'] = False
+
+    @staticmethod
+    def entry_key(entry):
+        return entry.get('nyaa_infohash') or entry.get('id') or entry.get('link')
+
+    async def new_entries(self, link):
+        if not (entries := await self.fetch(link)):
+            return []
+        unseen = {key: entry for entry in entries if (key := self.entry_key(entry)) and key not in self.__seen}
+        if unseen:
+            for key in await db.getSeen(unseen.keys()):
+                self.__seen.set(key)
+                del unseen[key]
+        if not unseen:
+            return []
+        state = self.__state(link)
+        if not state.get('known') and not await db.hasSeenFeed(link):
+            top = self.entry_key(entries[0])
+            LOGS.info(f"RSS Feed First Poll, Marking {len(unseen)} Old Entries as Seen: {link}")
+            fresh = [unseen[top]] if top in unseen else []
+        else:
+            fresh = list(unseen.values())
+        state['known'] = True
+        fresh_keys = {self.entry_key(entry) for entry in fresh}
+        await db.saveSeen([key for key in unseen if key not in fresh_keys], link)
+        for key in unseen:
+            self.__seen.set(key)
+        return fresh[::-1]
+
+    async def mark_seen(self, seen):
+        if seen:
+            await db.saveSeen([seen[0]], seen[1])
+
+    async def forget(self, seen):
+        if seen:
+            await db.dropSeen([seen[0]])
+
+rss = RSSFetcher(Var.RSS_INTERVAL)
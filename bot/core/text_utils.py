@@ -1,13 +1,15 @@
+from re import sub as resub
 from calendar import month_name
 from datetime import datetime
 from random import choice
 from asyncio import sleep as asleep
-from aiohttp import ClientSession
 from anitopy import parse
 
-from bot import Var, bot
-from .ffencoder import ffargs
+from bot import Var, bot, http_client
+from .ffprofile import ffprofiles
 from .func_utils import handle_logs
+from .cache_utils import TTLCache
+from .database import db
 from .reporter import rep
 
 CAPTION_FORMAT = """
@@ -116,9 +118,8 @@ class AniLister:
             self.__vars = {'search' : self.__ani_name}
     
     async def post_data(self):
-        async with ClientSession() as sess:
-            async with sess.post(self.__api, json={'query': ANIME_GRAPHQL_QUERY, 'variables': self.__vars}) as resp:
-                return (resp.status, await resp.json(), resp.headers)
+        async with http_client.session.post(self.__api, json={'query': ANIME_GRAPHQL_QUERY, 'variables': self.__vars}) as resp:
+            return (resp.status, await resp.json(), resp.headers)
         
     async def get_anidata(self):
         res_code, resp_json, res_heads = await self.post_data()
@@ -146,6 +147,41 @@ class AniLister:
             await rep.report(f"AniList API Error: {res_code}", "error", log=False)
             return {}
     
+class AniCache:
+    def __init__(self, ttl, neg_ttl, maxsize=512):
+        self.__ttl = ttl
+        self.__neg_ttl = neg_ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.db_hits = 0
+        self.db_misses = 0
+
+    @staticmethod
+    def make_key(pdata):
+        season = ani_s[-1] if isinstance(ani_s := pdata.get('anime_season') or '', list) else ani_s
+        key = f"{pdata.get('anime_title') or ''} {season} {pdata.get('anime_year') or ''}"
+        return resub(r'[^a-z0-9]+', ' ', key.lower()).strip()
+
+    async def get(self, key):
+        if (data := self.memory.get(key)) is not None:
+            return data
+        data, ttl_left = await db.getAniCache(key)
+        if data is None:
+            self.db_misses += 1
+            return None
+        self.db_hits += 1
+        self.memory.set(key, data, ttl=ttl_left)
+        return data
+
+    async def set(self, key, data):
+        ttl = self.__ttl if data else self.__neg_ttl
+        self.memory.set(key, data, ttl=ttl)
+        await db.saveAniCache(key, data, ttl)
+
+    def stats(self):
+        return {**self.memory.stats(), 'db_hits': self.db_hits, 'db_misses': self.db_misses}
+
+anilist_cache = AniCache(Var.ANILIST_TTL, Var.ANILIST_NEG_TTL)
+
 class TextEditor:
     def __init__(self, name):
         self.__name = name
@@ -153,6 +189,10 @@ class TextEditor:
         self.pdata = parse(name)
 
     async def load_anilist(self):
+        cache_key = AniCache.make_key(self.pdata)
+        if cache_key and (data := await anilist_cache.get(cache_key)) is not None:
+            self.adata = data
+            return
         cache_names = []
         for option in [(False, False), (False, True), (True, False), (True, True)]:
             ani_name = await self.parse_name(*option)
@@ -162,6 +202,8 @@ class TextEditor:
             self.adata = await AniLister(ani_name, datetime.now().year).get_anidata()
             if self.adata:
                 break
+        if cache_key:
+            await anilist_cache.set(cache_key, self.adata)
 
     @handle_logs
     async def get_id(self):
@@ -191,7 +233,7 @@ class TextEditor:
     @handle_logs
     async def get_upname(self, qual=""):
         anime_name = self.pdata.get("anime_title")
-        codec = 'HEVC' if 'libx265' in ffargs[qual] else 'AV1' if 'libaom-av1' in ffargs[qual] else ''
+        codec = ffprofiles[qual].codec_tag if qual in ffprofiles else ''
         lang = 'Multi-Audio' if 'multi-audio' in self.__name.lower() else 'Sub'
         anime_season = str(ani_s[-1]) if (ani_s := self.pdata.get('anime_season', '01')) and isinstance(ani_s, list) else str(ani_s)
         if anime_name and self.pdata.get("episode_number"):
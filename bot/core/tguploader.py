@@ -1,15 +1,18 @@
-from time import time, sleep
+from time import time
 from traceback import format_exc
 from math import floor
 from os import path as ospath
 from aiofiles.os import remove as aioremove
-from pyrogram.errors import FloodWait
 import os
 import asyncio
 from asyncio.subprocess import PIPE
 
-from bot import bot, Var
-from .func_utils import editMessage, sendMessage, convertBytes, convertTime
+from pyrogram import StopTransmission
+
+from bot import bot, Var, http_client
+from .partupload import PartUploader
+from .progress import updater
+from .func_utils import editMessage, sendMessage, mediainfo, convertBytes, convertTime
 from .reporter import rep
 
 class TgUploader:
@@ -19,45 +22,39 @@ class TgUploader:
         self.__name = ""
         self.__qual = ""
         self.__client = bot
+        self.__engine = PartUploader(bot, Var.UP_SESSIONS, Var.UP_WORKERS, Var.UP_PART_KB)
         self.__start = time()
-        self.__updater = time()
 
-    async def upload(self, path, qual):
+    async def upload(self, path, qual, file_id=None, acked=None, on_part=None):
         self.__name = ospath.basename(path)
         self.__qual = qual
         
         # Generate or get thumbnail for the video
         thumb_path = await self._get_or_generate_thumbnail(path)
         
+        msg = None
         try:
-            if Var.AS_DOC:
-                return await self.__client.send_document(
-                    chat_id=Var.FILE_STORE,
-                    document=path,
-                    thumb=thumb_path,
-                    caption=f"<i>{self.__name}</i>",
-                    force_document=True,
-                    progress=self.progress_status
-                )
-            else:
-                return await self.__client.send_video(
-                    chat_id=Var.FILE_STORE,
-                    video=path,
-                    thumb=thumb_path,
-                    caption=f"<i>{self.__name}</i>",
-                    progress=self.progress_status
-                )
-        except FloodWait as e:
-            await rep.report(f"FloodWait: Sleeping for {e.value} seconds", "warning")
-            sleep(e.value * 1.5)
-            return await self.upload(path, qual)
+            msg = await self.__engine.send(Var.FILE_STORE, path,
+                caption=f"<i>{self.__name}</i>",
+                thumb=thumb_path,
+                as_doc=Var.AS_DOC,
+                duration=0 if Var.AS_DOC else int(await mediainfo(path, get_duration=True)),
+                progress=self.progress_status,
+                file_id=file_id,
+                acked=acked,
+                on_part=on_part
+            )
+            return msg
+        except StopTransmission:
+            return None
         except Exception as e:
             await rep.report(f"Upload Error: {str(e)}\n{format_exc()}", "error")
             raise e
         finally:
-            # Clean up the uploaded file and generated thumbnail
+            # Clean up the uploaded file and generated thumbnail ( a failed upload is left for the journal )
             try:
-                await aioremove(path)
+                if msg:
+                    await aioremove(path)
                 # Clean up generated thumbnail if it's not the default one
                 if thumb_path and thumb_path.startswith("thumbs/"):
                     try:
@@ -208,28 +205,26 @@ class TgUploader:
             return None
             
         try:
-            import aiohttp
             import aiofiles
             
             thumb_path = "thumb_default.jpg"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(Var.THUMB) as response:
-                    if response.status == 200:
-                        async with aiofiles.open(thumb_path, "wb") as f:
-                            async for chunk in response.content.iter_chunked(8192):
-                                await f.write(chunk)
-                        
-                        # Validate downloaded thumbnail
-                        if ospath.exists(thumb_path) and ospath.getsize(thumb_path) > 0:
-                            await rep.report("Default thumbnail downloaded successfully", "info")
-                            return thumb_path
-                        else:
-                            await rep.report("Downloaded thumbnail is invalid", "warning")
-                            return None
+            async with http_client.session.get(Var.THUMB) as response:
+                if response.status == 200:
+                    async with aiofiles.open(thumb_path, "wb") as f:
+                        async for chunk in response.content.iter_chunked(8192):
+                            await f.write(chunk)
+                    
+                    # Validate downloaded thumbnail
+                    if ospath.exists(thumb_path) and ospath.getsize(thumb_path) > 0:
+                        await rep.report("Default thumbnail downloaded successfully", "info")
+                        return thumb_path
                     else:
-                        await rep.report(f"Failed to download thumbnail: HTTP {response.status}", "warning")
+                        await rep.report("Downloaded thumbnail is invalid", "warning")
                         return None
+                else:
+                    await rep.report(f"Failed to download thumbnail: HTTP {response.status}", "warning")
+                    return None
         except Exception as e:
             await rep.report(f"Error downloading default thumbnail: {str(e)}", "error")
             return None
@@ -238,34 +233,34 @@ class TgUploader:
         if self.cancelled:
             self.__client.stop_transmission()
         
-        now = time()
-        diff = now - self.__start
+        if current != total and not updater.due(self.message):
+            return
+        percent = round(current / total * 100, 2) if total > 0 else 0
         
-        # Update progress every 7 seconds or when complete
-        if (now - self.__updater) >= 7 or current == total:
-            self.__updater = now
-            percent = round(current / total * 100, 2) if total > 0 else 0
-            speed = current / diff if diff > 0 else 0
+        def render():
+            diff = time() - self.__start
+            speed = self.__engine.speed or (current / diff if diff > 0 else 0)
             eta = round((total - current) / speed) if speed > 0 else 0
             bar = floor(percent/8)*"█" + (12 - floor(percent/8))*"▒"
             
-            progress_str = f"""‣ <b>Anime Name :</b> <b><i>{self.__name}</i></b>
+            return f"""‣ <b>Anime Name :</b> <b><i>{self.__name}</i></b>
 
 ‣ <b>Status :</b> <i>Uploading</i>
     <code>[{bar}]</code> {percent}%
     
     ‣ <b>Size :</b> {convertBytes(current)} out of ~ {convertBytes(total)}
     ‣ <b>Speed :</b> {convertBytes(speed)}/s
+    ‣ <b>Connections :</b> {self.__engine.sessions} × {self.__engine.workers}
     ‣ <b>Time Took :</b> {convertTime(diff)}
     ‣ <b>Time Left :</b> {convertTime(eta)}
 
 ‣ <b>File(s) Encoded:</b> <code>{Var.QUALS.index(self.__qual) + 1} / {len(Var.QUALS)}</code>"""
-            
-            try:
-                await editMessage(self.message, progress_str)
-            except Exception as e:
-                # Don't let progress update errors stop the upload
-                pass
+        
+        try:
+            await updater.update(self.message, render, percent, final=current == total)
+        except Exception as e:
+            # Don't let progress update errors stop the upload
+            pass
 
     def cancel_upload(self):
         """Cancel the current upload"""
@@ -1,13 +1,117 @@
 from os import path as ospath
+from math import ceil
+from time import time, sleep
+from uuid import uuid4
+from errno import ENXIO
+from asyncio import sleep as asleep
 from aiofiles import open as aiopen
 from aiofiles.os import path as aiopath, remove as aioremove, mkdir, listdir
 import os
 import glob
 
-from aiohttp import ClientSession
+import libtorrent as lt
 from torrentp import TorrentDownloader
-from bot import LOGS
-from bot.core.func_utils import handle_logs
+from bot import Var, LOGS, http_client
+from bot.core.func_utils import handle_logs, sync_to_async
+
+class TorStream:
+    def __init__(self, session, handle, save_path, stall=300):
+        self.__ses = session
+        self.__handle = handle
+        self.__save_path = save_path
+        self.__stall = stall
+        self.__cancelled = False
+        self.__pump = None
+        self.__done, self.__last = 0, time()
+        self.path = None
+        self.fifo = None
+        self.error = None
+
+    def __check(self):
+        if self.error:
+            return self.error
+        status = self.__handle.status()
+        if status.errc.value():
+            self.error = status.errc.message()
+        elif status.is_seeding or status.total_wanted_done > self.__done:
+            self.__done, self.__last = status.total_wanted_done, time()
+        elif time() - self.__last > self.__stall:
+            self.error = f"No Download Progress for {self.__stall}s"
+        return self.error
+
+    async def prepare(self, timeout=600):
+        start = time()
+        while not self.__handle.status().has_metadata:
+            if time() - start > timeout:
+                return False
+            await asleep(1)
+        tinfo = self.__handle.torrent_file()
+        if (files := tinfo.files()).num_files() != 1:
+            LOGS.info("Torrent has Multiple Files, Streaming Disabled")
+            return False
+        self.path = ospath.join(self.__save_path, files.file_path(0))
+        self.__size = files.file_size(0)
+        self.__piece_len = tinfo.piece_length()
+        self.__pieces = tinfo.num_pieces()
+        buffer_pieces = min(self.__pieces, ceil(Var.TOR_STREAM_BUFFER * 1024 * 1024 / self.__piece_len))
+        while not all(self.__handle.have_piece(i) for i in range(buffer_pieces)):
+            if self.__check():
+                LOGS.error(f"Torrent Stream Failed while Buffering: {self.error}")
+                return False
+            await asleep(2)
+        self.fifo = ospath.join("encode", f"stream_{uuid4().hex[:8]}.mkv")
+        os.mkfifo(self.fifo)
+        self.__pump = await sync_to_async(self.__pump_pieces, wait=False)
+        LOGS.info(f"Streaming {self.path} into {self.fifo}")
+        return True
+
+    def __pump_pieces(self):
+        fd = None
+        while fd is None:
+            if self.__cancelled:
+                return
+            try:
+                fd = os.open(self.fifo, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != ENXIO:
+                    raise
+                sleep(0.5)
+        os.set_blocking(fd, True)
+        try:
+            with open(self.path, 'rb') as src, os.fdopen(fd, 'wb') as out:
+                for piece in range(self.__pieces):
+                    while not self.__handle.have_piece(piece):
+                        if self.__cancelled or self.__check():
+                            return
+                        sleep(1)
+                    src.seek(piece * self.__piece_len)
+                    out.write(src.read(min(self.__piece_len, self.__size - piece * self.__piece_len)))
+        except BrokenPipeError:
+            LOGS.warning("Stream Reader Closed before Torrent Stream Finished")
+
+    async def watch(self, on_stall):
+        while not self.__cancelled and not self.__check():
+            await asleep(2)
+        if self.error:
+            LOGS.error(f"Torrent Stream Stalled, Stopping Encode: {self.error}")
+            await on_stall()
+
+    async def wait(self):
+        while not self.__handle.status().is_seeding:
+            if self.__check():
+                raise RuntimeError(f"Torrent Stream Failed: {self.error}")
+            await asleep(2)
+        await self.cancel()
+        return self.path
+
+    async def cancel(self):
+        self.__cancelled = True
+        if self.fifo and ospath.exists(self.fifo):
+            await aioremove(self.fifo)
+        try:
+            self.__ses.remove_torrent(self.__handle)
+        except Exception:
+            pass
 
 class TorDownloader:
     def __init__(self, path="."):
@@ -55,6 +159,27 @@ class TorDownloader:
         
         return None
 
+    @handle_logs
+    async def stream(self, torrent):
+        if torrent.startswith("magnet:"):
+            params = lt.parse_magnet_uri(torrent)
+        elif torfile := await self.get_torfile(torrent):
+            params = lt.add_torrent_params()
+            try:
+                params.ti = lt.torrent_info(torfile)
+            finally:
+                await aioremove(torfile)
+        else:
+            return None
+        params.save_path = self.__downdir
+        params.flags |= lt.torrent_flags.sequential_download
+        session = lt.session({'listen_interfaces': '0.0.0.0:0'})
+        tor_stream = TorStream(session, session.add_torrent(params), self.__downdir, Var.TOR_STREAM_STALL)
+        if await tor_stream.prepare():
+            return tor_stream
+        await tor_stream.cancel()
+        return None
+
     @handle_logs
     async def _find_downloaded_file(self, expected_name=None):
         """Find the downloaded file in the downloads directory"""
@@ -144,17 +269,16 @@ class TorDownloader:
         des_dir = ospath.join(self.__torpath, tor_name)
         
         try:
-            async with ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        async with aiopen(des_dir, 'wb') as file:
-                            async for chunk in response.content.iter_any():
-                                await file.write(chunk)
-                        LOGS.info(f"Downloaded torrent file: {des_dir}")
-                        return des_dir
-                    else:
-                        LOGS.error(f"Failed to download torrent file. Status: {response.status}")
-                        return None
+            async with http_client.session.get(url) as response:
+                if response.status == 200:
+                    async with aiopen(des_dir, 'wb') as file:
+                        async for chunk in response.content.iter_any():
+                            await file.write(chunk)
+                    LOGS.info(f"Downloaded torrent file: {des_dir}")
+                    return des_dir
+                else:
+                    LOGS.error(f"Failed to download torrent file. Status: {response.status}")
+                    return None
         except Exception as e:
             LOGS.error(f"Error downloading torrent file: {str(e)}")
             return None
@@ -1,13 +1,20 @@
 import urllib.parse
-from asyncio import sleep as asleep, gather
-from pyrogram.filters import command, private, user
+from asyncio import gather
+from pyrogram.filters import command, private, user, chat
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from pyrogram.errors import FloodWait, MessageNotModified
 
-from bot import bot, bot_loop, Var, ani_cache
+from bot import bot, bot_loop, bot_info, Var, ani_cache
 from bot.core.database import db
-from bot.core.func_utils import decode, is_fsubbed, get_fsubs, editMessage, sendMessage, new_task, convertTime, getfeed
+from bot.core.func_utils import encode, decode, is_fsubbed, get_fsubs, editMessage, sendMessage, new_task, convertTime, getfeed
 from bot.core.auto_animes import get_animes
+from bot.core.ffqueue import ffQueue
+from bot.core.text_utils import anilist_cache
+from bot.core.filestore import file_store
+from bot.core.fsub import fsub
+from bot.core.autodel import autodel
+from bot.core.executors import executors
+from bot.core.progress import updater
 from bot.core.reporter import rep
 
 @bot.on_message(command('start') & private)
@@ -51,31 +58,43 @@ async def start_msg(client, message):
         await rep.report(f"User : {uid} | Error : {str(e)}", "error")
         await editMessage(temp, "<b>Input Link Code Decode Failed !</b>")
         return
-    if len(arg) == 2 and arg[0] == 'get':
+    if len(arg) in (2, 3) and arg[0] == 'get':
         try:
-            fid = int(int(arg[1]) / abs(int(Var.FILE_STORE)))
+            fids = [int(int(code) / abs(int(Var.FILE_STORE))) for code in arg[1:]]
+            if (span := max(fids) - min(fids) + 1) > Var.BATCH_LIMIT:
+                raise ValueError(f"Batch of {span} Files Exceeds Limit")
+            fids = list(range(min(fids), max(fids) + 1))
         except Exception as e:
             await rep.report(f"User : {uid} | Error : {str(e)}", "error")
             await editMessage(temp, "<b>Input Link Code is Invalid !</b>")
             return
         try:
-            msg = await client.get_messages(Var.FILE_STORE, message_ids=fid)
-            if msg.empty:
+            sent = []
+            for fid, data in (await file_store.resolve(fids)).items():
+                if not data:
+                    continue
+                try:
+                    if nmsg := await file_store.send(message.chat.id, fid, data):
+                        sent.append(nmsg)
+                except Exception as e:
+                    await rep.report(f"User : {uid} | File : {fid} | Error : {str(e)}", "error")
+            if not sent:
                 return await editMessage(temp, "<b>File Not Found !</b>")
-            nmsg = await msg.copy(message.chat.id, reply_markup=None)
             await temp.delete()
             if Var.AUTO_DEL:
-                async def auto_del(msg, timer):
-                    await asleep(timer)
-                    await msg.delete()
-                await sendMessage(message, f'<i>File will be Auto Deleted in {convertTime(Var.DEL_TIMER)}, Forward to Saved Messages Now..</i>')
-                bot_loop.create_task(auto_del(nmsg, Var.DEL_TIMER))
+                await sendMessage(message, f'<i>{"File" if len(sent) == 1 else f"{len(sent)} Files"} will be Auto Deleted in {convertTime(Var.DEL_TIMER)}, Forward to Saved Messages Now..</i>')
+                await autodel.schedule(message.chat.id, [nmsg.id for nmsg in sent], Var.DEL_TIMER)
         except Exception as e:
             await rep.report(f"User : {uid} | Error : {str(e)}", "error")
             await editMessage(temp, "<b>File Not Found !</b>")
     else:
         await editMessage(temp, "<b>Input Link is Invalid for Usage !</b>")
 
+@bot.on_chat_member_updated(chat(Var.FSUB_CHATS))
+async def fsub_member_update(client, update):
+    if member := (update.new_chat_member or update.old_chat_member):
+        fsub.update(member.user.id, update.chat.id, update.new_chat_member.status if update.new_chat_member else None)
+
 @bot.on_message(command('help') & private & user(Var.ADMINS))
 @new_task
 async def help_cmd(client, message):
@@ -85,6 +104,7 @@ async def help_cmd(client, message):
 • <code>/start</code> - Start the bot
 • <code>/help</code> - Show this help message
 • <code>/log</code> - Get bot log file
+• <code>/stats</code> - Show cache statistics
 
 <b>🎛️ Control:</b>
 • <code>/pause</code> - Pause anime fetching
@@ -92,9 +112,15 @@ async def help_cmd(client, message):
 • <code>/restart</code> - Restart the bot
 
 <b>➕ Add Tasks:</b>
-• <code>/addlink &lt;rss_url&gt;</code> - Add RSS feed link
+• <code>/addlink &lt;rss_url&gt;[|seconds]</code> - Add RSS feed link
 • <code>/addtask &lt;rss_url&gt; [index]</code> - Add specific RSS task
 • <code>/addmagnet &lt;magnet_link&gt;</code> - Add magnet link task
+• <code>/batch &lt;first_id&gt; &lt;last_id&gt;</code> - Make one link for a range of stored files
+
+<b>📥 Encode Queue:</b>
+• <code>/queue</code> - View running and queued encode tasks
+• <code>/qtop &lt;post_id&gt;</code> - Move a queued task to the top
+• <code>/qprio &lt;post_id&gt; &lt;priority&gt;</code> - Set priority of a queued task
 
 <b>🎉 Sticker Management:</b>
 • <code>/togglesticker</code> - Enable/disable celebration stickers
@@ -124,14 +150,33 @@ async def pause_fetch(client, message):
 async def _log(client, message):
     await message.reply_document("log.txt", quote=True)
 
+@bot.on_message(command('stats') & private & user(Var.ADMINS))
+@new_task
+async def _stats(client, message):
+    ani, fst = anilist_cache.stats(), file_store.stats()
+    await sendMessage(message, f"""<b>📊 Bot Stats</b>
+
+<b>AniList Cache :</b>
+    • <b>Memory :</b> {ani['size']} Items | {ani['hits']} Hits | {ani['misses']} Misses ({ani['ratio']}%)
+    • <b>Database :</b> {ani['db_hits']} Hits | {ani['db_misses']} Misses
+
+<b>File Store Cache :</b> {fst['size']} Items | {fst['hits']} Hits | {fst['misses']} Misses ({fst['ratio']}%) | {fst['fetched']} Fetches
+
+<b>Progress Edits :</b> {updater.sent} Sent | {updater.skipped} Skipped
+
+<b>Auto Deleted :</b> {autodel.deleted} Messages
+
+<b>Executor Pools :</b>
+""" + "\n".join(f"    • <b>{name.upper()} ({st['type']}) :</b> {st['running']}/{st['workers']} Busy ({st['utilization']}%) | {st['queued']} Queued | {st['completed']} Done" for name, st in executors.stats().items()))
+
 @bot.on_message(command('addlink') & private & user(Var.ADMINS))
 @new_task
 async def add_task(client, message):
     if len(args := message.text.split()) <= 1:
         return await sendMessage(message, "<b>No Link Found to Add</b>")
     
-    Var.RSS_ITEMS.append(args[0])
-    req_msg = await sendMessage(message, f"`Global Link Added Successfully!`\n\n    • **All Link(s) :** {', '.join(Var.RSS_ITEMS)[:-2]}")
+    Var.RSS_ITEMS.append(args[1])
+    req_msg = await sendMessage(message, f"`Global Link Added Successfully!`\n\n    • **All Link(s) :** {', '.join(Var.RSS_ITEMS)}")
 
 @bot.on_message(command('addtask') & private & user(Var.ADMINS))
 @new_task
@@ -180,6 +225,40 @@ async def add_magnet_task(client, message):
         await rep.report(f"Error adding magnet task: {str(e)}", "error")
         await sendMessage(message, f"<b>Error processing magnet link!</b>\n\n<i>Error: {str(e)}</i>")
 
+@bot.on_message(command('batch') & private & user(Var.ADMINS))
+@new_task
+async def batch_link(client, message):
+    if len(args := message.text.split()) <= 2 or not (args[1].isdigit() and args[2].isdigit()):
+        return await sendMessage(message, "<b>Usage :</b> <code>/batch &lt;first_msg_id&gt; &lt;last_msg_id&gt;</code>")
+    first, last = sorted((int(args[1]), int(args[2])))
+    if last - first + 1 > Var.BATCH_LIMIT:
+        return await sendMessage(message, f"<b>Batch Limit is {Var.BATCH_LIMIT} Files</b>")
+    code = await encode(f"get-{first * abs(Var.FILE_STORE)}-{last * abs(Var.FILE_STORE)}")
+    await sendMessage(message, f"<b>Batch Link :</b> {bot_info.link(code)}")
+
+@bot.on_message(command('queue') & private & user(Var.ADMINS))
+@new_task
+async def view_queue(client, message):
+    txt = f"<b>📥 Encode Queue</b>\n\n<b>Running ({len(ffQueue.active)}/{ffQueue.workers}) :</b> <code>{', '.join(map(str, ffQueue.active)) or 'None'}</code>\n\n"
+    if not (tasks := ffQueue.info()):
+        return await sendMessage(message, txt + "<i>No Tasks Waiting in Queue.</i>")
+    for pos, (post_id, name, prio, score) in enumerate(tasks, start=1):
+        txt += f"<b>{pos}.</b> <code>{post_id}</code> - <i>{name}</i>\n    <b>Priority :</b> {prio} <b>| Effective :</b> {score}\n"
+    await sendMessage(message, txt[:4096])
+
+@bot.on_message(command(['qtop', 'qprio']) & private & user(Var.ADMINS))
+@new_task
+async def reorder_queue(client, message):
+    args = message.text.split()
+    try:
+        post_id = int(args[1])
+        priority = float(args[2]) if args[0].lower().startswith('/qprio') else None
+    except (IndexError, ValueError):
+        return await sendMessage(message, "<b>Invalid Usage!</b>\n\n<i>Usage:</i> <code>/qtop &lt;post_id&gt;</code> or <code>/qprio &lt;post_id&gt; &lt;priority&gt;</code>")
+    if not ffQueue.set_priority(post_id, priority):
+        return await sendMessage(message, "<b>No Queued Task Found with that Post ID</b>")
+    await sendMessage(message, f"<b>Task Reordered!</b>\n\n    • <b>Post ID :</b> <code>{post_id}</code>\n    • <b>Queue Position :</b> {ffQueue.position(post_id)}")
+
 @bot.on_message(command('togglesticker') & private & user(Var.ADMINS))
 @new_task
 async def toggle_sticker(client, message):
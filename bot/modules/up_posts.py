@@ -1,30 +1,37 @@
 from json import loads as jloads
 from os import path as ospath, execl
 from sys import executable
+from asyncio import gather, wait_for, TimeoutError as AsyncTimeoutError
 
-from aiohttp import ClientSession
-from bot import Var, bot, ffQueue
+from bot import Var, bot, http_client
+from bot.core.ffqueue import ffQueue
+from bot.core.journal import journal
+from bot.core.executors import executors
 from bot.core.text_utils import TextEditor
+from bot.core.ratelimit import tglimiter
 from bot.core.reporter import rep
 
 async def upcoming_animes():
     if Var.SEND_SCHEDULE:
         try:
-            async with ClientSession() as ses:
-                res = await ses.get("https://subsplease.org/api/?f=schedule&h=true&tz=Asia/Kolkata")
+            async with http_client.session.get("https://subsplease.org/api/?f=schedule&h=true&tz=Asia/Kolkata") as res:
                 aniContent = jloads(await res.text())["schedule"]
             text = "<b>📆 Today's Anime Releases Schedule [IST]</b>\n\n"
             for i in aniContent:
                 aname = TextEditor(i["title"])
                 await aname.load_anilist()
                 text += f''' <a href="https://subsplease.org/shows/{i['page']}">{aname.adata.get('title', {}).get('english') or i['title']}</a>\n    • <b>Time</b> : {i["time"]} hrs\n\n'''
-            TD_SCHR = await bot.send_message(Var.MAIN_CHANNEL, text)
+            TD_SCHR = await tglimiter.call(Var.MAIN_CHANNEL, bot.send_message, Var.MAIN_CHANNEL, text)
             await (await TD_SCHR.pin()).delete()
         except Exception as err:
             await rep.report(str(err), "error")
-    if not ffQueue.empty():
-        await ffQueue.join()
+    try:
+        await wait_for(gather(ffQueue.join(), journal.join()), Var.RESTART_TIMEOUT or None)
+    except AsyncTimeoutError:
+        await rep.report(f"{journal.running} Task(s) Still Running after {Var.RESTART_TIMEOUT}s, Restarting Anyway...", "warning")
     await rep.report("Auto Restarting..!!", "info")
+    await http_client.close()
+    executors.shutdown()
     execl(executable, executable, "-m", "bot")
 
 async def update_shdr(name, link):